@@ -1,11 +1,15 @@
 import os
 from collections import OrderedDict
-import random
-import string
+import io
 import zipfile
-from typing import List, Set, Union, Dict, Callable, Optional, Tuple
+from types import MappingProxyType
+from typing import List, Set, Union, Dict, Callable, Optional, Tuple, NamedTuple, FrozenSet, Mapping
 import xml.etree.ElementTree as etree
 import json
+import pickle
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from re import findall as re_find
 from enum import Enum
 
@@ -26,12 +30,17 @@ from Framework.ETLobjects.chimera_files import ChimeraCollector
 from helpers.parsers import log_parser
 from helpers.parsers import SasScriptsParser, ChimeraSqlScriptParser
 from Framework.ETLobjects.job import JobDetail
-from Framework.ETLobjects.dag import TediDag, DagNotInRepository
+from Framework.ETLobjects.backup_ddl import BackupDdlIndex
+from Framework.ETLobjects.vial_objects import VialObjectIndex
+from Framework.ETLobjects.dag import TediDag, DagNotInRepository, DagLoadResult, load_tedi_dags, \
+    TEDI_DAG_INIT_LOCK
 from Framework.ETLobjects.table import TableFactory, get_prefix, TableDetail, DlhTable
 from Framework.ETLobjects.package import PackageObject
+from Framework.ETLobjects.package_catalog import PackageFileCatalog
 from Framework.utils.cut2_util import Cut2Util
 from Framework.ETLobjects.cut2_sttings import Cut2Settings
 from common.postgresql import GreenPlumSQL
+from Framework.utils.gp_connection_pool import LazyGreenPlumConnection, get_gp_pool, get_gp_prod_pool
 from Framework.utils.dlh.sparksql import SparkSQL
 
 from dwh_metadata_extractor import MgClient
@@ -39,7 +48,80 @@ from Framework.utils.mg_v2_util import MgReplicaGpHelper
 from helpers.depend_dict_differ import DepDictDiffer
 from helpers.execution_timer import execution_timer
 from Framework.utils.parse_deploy_and_check import NoDeploy, CantGetDeployFromRepository
+from Framework.utils.deploy_code_store import DeployCodeStore
 from helpers.common import set_prefix_in_schema
+from helpers.method_cache import cached_method
+
+
+SNAPSHOT_FORMAT_NAME = 'SASpackageSnapshot'
+SNAPSHOT_FORMAT_VERSION = 1
+SNAPSHOT_PICKLE_PROTOCOL = 5
+
+
+class PackageSnapshotError(Exception):
+    pass
+
+
+# сколько DLH таблиц одновременно запрашиваем в Spark
+DLH_COLUMNS_WORKERS = 4
+
+# сколько таблиц передаем в один запрос колонок к каталогу GP
+GP_COLUMNS_QUERY_CHUNK = 500
+
+# типы объектов в MG реплике
+MG_JOB_TYPE = 'JOB'
+MG_TABLE_TYPE = 'TABLE'
+
+# для скольких spk файлов держим в памяти собранные факты
+SPK_CACHE_SIZE = 64
+
+
+class SpkFacts(NamedTuple):
+    """
+    Факты из TransportMetadata.xml spk файла, нужные анализатору пакета
+    """
+    # Column@SASColumnName в нижнем регистре
+    columns: FrozenSet[str]
+    # TextStore@StoredText в нижнем регистре для TextStore с кодом
+    code_lines: FrozenSet[str]
+    # пары (Extension@Name, Extension@Value)
+    extension_attributes: Tuple[Tuple[str, str], ...]
+    # '<text>cut2</text>', если найден стикер с кат2
+    sticky_note: Optional[str]
+
+
+class ColumnsDiff(NamedTuple):
+    """
+    Результат сравнения колонок таблицы с ее бэкапом (CompareDdl.find_add_drop_rename_columns).
+    Хранится в кэше пакета, поэтому наборы колонок - неизменяемые кортежи
+    """
+    # добавленные колонки
+    added: Tuple[str, ...]
+    # удаленные/измененные колонки
+    changed: Tuple[str, ...]
+    # колонки ДО доработки
+    old: Tuple[str, ...]
+
+
+def fetch_deploy_code_from_etl_repository(job: str) -> str:
+    return ParseDeployAndCheck(job, False, 'vial').get_deploy_code_from_etl_repository()
+
+
+def filters_cache_key(filters: str = 'Dag{}') -> str:
+    return filters
+
+
+def dlh_columns_cache_key(table: str, spark_sql: SparkSQL) -> str:
+    return table
+
+
+def close_spark_sql(spark_sql: SparkSQL):
+    close = getattr(spark_sql, 'close', None)
+    if callable(close):
+        try:
+            close()
+        except Exception as e:
+            print('LOG: Cant close SparkSQL client: {0}'.format(e))
 
 
 class UrnPrefixes(Enum):
@@ -66,6 +148,7 @@ class BasePackage:
 
         self.not_parsed = True
         self.not_removed = True
+        self._file_catalog = None
 
     def __repr__(self) -> str:
         return f"Package: {self.name}"
@@ -106,6 +189,13 @@ class BasePackage:
         """
         return self._pack.getMetaObjectsBeforeAlter(filters)
 
+    @property
+    def file_catalog(self) -> PackageFileCatalog:
+        """Каталог файлов пакета, собирается одним обходом каталога пакета при первом обращении."""
+        if self._file_catalog is None:
+            self._file_catalog = PackageFileCatalog.scan(self.path)
+        return self._file_catalog
+
     def init_type(self):
         pass
 
@@ -167,39 +257,22 @@ class BasePackage:
 
 
 class SASpackage(BasePackage):
+    URN_PREFIXES_BY_TABLE_TYPE = {'gp': UrnPrefixes.UrnGpPrefix, 'dlh': UrnPrefixes.UrnDlhPrefix}
+
     def __init__(self, name, path, no_connect=False):
         super(SASpackage, self).__init__(name, path)
 
         self._contour = enviroment.local['tag_small']
-        self.__cashed_targets_gptables_with_dep_dags = None
-        self.__cashed_targets_dlhtables_with_dep_dags = None
-        self.__cashed_TargetsWithDepJobsMG = None
-        self.__cashed_ChangeColumsOfTables = OrderedDict()
         self.__cashed_jobs_deploys = {}
-        self.__cashed_table_phys_in_pack = set()
-        self.__cashed_dlh_table_phys_in_pack = set()
         self.__cashed_prod_load_params = []
-        self.__cashed_dd_relations = dict()
-        self.__cashed_columns_with_types = dict()
-        self.__cashed_columns_with_types_for_dlh = dict()
 
         self._increment_settings_table = dict()
+        # найденные URN таблиц по (реплика, имя на проде, тип) и зависимые даги по (реплика, URN)
+        self._table_urns: Dict[Tuple[str, str, str], str] = {}
+        self._depend_dags_by_urn: Dict[Tuple[str, str], List[str]] = {}
 
-        if not no_connect:
-            self.GPConnection = GreenPlumSQL(enviroment.local['gp']['Host'],
-                                             enviroment.local['gp']['Port'],
-                                             enviroment.local['gp']['DbName'], user.GPLogin,
-                                             user.GPPassword)
-
-        g_conf = GlobalConfig()
-        try:
-            if not no_connect:
-                self.gp_prod_conn = GreenPlumSQL(enviroment.local['gp_prod']['Host'], enviroment.local['gp_prod']['Port'],
-                                                 enviroment.local['gp_prod']['DbName'],
-                                                 g_conf.gp_prod_user,
-                                                 g_conf.gp_prod_password)
-        except Exception as e:
-            self.gp_prod_conn = None
+        # подключения к GP открываются при первом обращении (no_connect оставлен для совместимости)
+        self._reset_connections()
 
     @property
     def contour(self) -> str:
@@ -209,37 +282,148 @@ class SASpackage(BasePackage):
     def increment_size_table(self) -> dict:
         return self._increment_settings_table
 
+    @property
+    def backup_ddl_index(self) -> BackupDdlIndex:
+        """Индекс файла с DDL бэкапов таблиц пакета, файл читается один раз при первом обращении."""
+        if self.__dict__.get('_backup_ddl_index') is None:
+            self._backup_ddl_index = BackupDdlIndex(os.path.join(self.path, pack_path.bckp_ddl))
+        return self._backup_ddl_index
+
+    @property
+    def deploy_code_store(self) -> DeployCodeStore:
+        """Общее для пакета хранилище кода деплоя зависимых джобов из ETL-репозитория."""
+        if self.__dict__.get('_deploy_code_store') is None:
+            self._deploy_code_store = DeployCodeStore(fetch_deploy_code_from_etl_repository)
+        return self._deploy_code_store
+
+    @property
+    def contour_deploy_code_store(self) -> DeployCodeStore:
+        """Хранилище кода деплоя зависимых джобов на контуре пакета."""
+        if self.__dict__.get('_contour_deploy_code_store') is None:
+            self._contour_deploy_code_store = DeployCodeStore(self._fetch_contour_deploy_code)
+        return self._contour_deploy_code_store
+
+    def _fetch_contour_deploy_code(self, job: str) -> str:
+        # main=False т.к. джобы зависимые!
+        return self.job_factory(job, '', main=False, countour=self._contour).get_deploy_code()
+
+    def _reset_connections(self):
+        self._gp_connection = None
+        self._gp_prod_connection = None
+        self._gp_prod_connect_failed = False
+
+    @property
+    def GPConnection(self) -> Union[GreenPlumSQL, LazyGreenPlumConnection]:
+        """Подключение к тестовому контуру: сессия из общего пула, открывается при первом запросе."""
+        if self._gp_connection is None:
+            self._gp_connection = LazyGreenPlumConnection(get_gp_pool())
+        return self._gp_connection
+
+    @GPConnection.setter
+    def GPConnection(self, connection: Union[GreenPlumSQL, LazyGreenPlumConnection]):
+        self._gp_connection = connection
+
+    @property
+    def gp_prod_conn(self) -> Optional[Union[GreenPlumSQL, LazyGreenPlumConnection]]:
+        """Подключение к проду из общего пула, None - если подключиться не удалось (повторно не пытаемся)."""
+        if self._gp_prod_connection is None and not self._gp_prod_connect_failed:
+            gp_prod_connection = LazyGreenPlumConnection(get_gp_prod_pool())
+            if gp_prod_connection.connect():
+                self._gp_prod_connection = gp_prod_connection
+            else:
+                self._gp_prod_connect_failed = True
+        return self._gp_prod_connection
+
+    @gp_prod_conn.setter
+    def gp_prod_conn(self, connection: Optional[Union[GreenPlumSQL, LazyGreenPlumConnection]]):
+        self._gp_prod_connection = connection
+
+    def __getstate__(self) -> dict:
+        # подключения не сериализуем, после загрузки они откроются заново при первом обращении
+        state = self.__dict__.copy()
+        for connection_attr in ('_gp_connection', '_gp_prod_connection', '_gp_prod_connect_failed',
+                                '_deploy_code_store', '_contour_deploy_code_store'):
+            state.pop(connection_attr, None)
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self._reset_connections()
+
+    def close(self):
+        """
+        Освобожу ресурсы пакета (подключения к GP, прочитанный файл DDL бэкапов), при следующем обращении
+        они откроются заново
+        """
+        if self.__dict__.get('_backup_ddl_index') is not None:
+            self._backup_ddl_index.close()
+        for connection in (self.__dict__.get('_gp_connection'), self.__dict__.get('_gp_prod_connection')):
+            if isinstance(connection, LazyGreenPlumConnection):
+                connection.release()
+        self._reset_connections()
+
     def pre_pickle_dump(self):
-        self.GPConnection = ''
-        self.gp_prod_conn = ''
+        self.close()
 
     def post_pickle_load(self):
-        self.GPConnection = GreenPlumSQL(enviroment.local['gp']['Connections'][0]['Host'],
-                                         enviroment.local['gp']['Connections'][0]['Port'],
-                                         enviroment.local['gp']['Connections'][0]['DbName'], user.GPLogin,
-                                         user.GPPassword)
+        self._reset_connections()
+
+    def dump_snapshot(self, snapshot_path: str):
+        """Сохраню снимок разобранного пакета: модель пакета и посчитанные кэши, без подключений.
+
+        Файл снимка состоит из заголовка (формат и версия) и состояния пакета, оба в pickle protocol 5.
 
-        g_conf = GlobalConfig()
+        :param snapshot_path: путь к файлу снимка
+        """
+        header = {'format': SNAPSHOT_FORMAT_NAME, 'version': SNAPSHOT_FORMAT_VERSION,
+                  'class': type(self).__name__, 'name': self.name}
+        fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(snapshot_path) + '.', suffix='.tmp',
+                                        dir=os.path.dirname(snapshot_path) or None)
         try:
-            self.gp_prod_conn = GreenPlumSQL(enviroment.local['gp_prod']['Host'], enviroment.local['gp_prod']['Port'],
-                                             enviroment.local['gp_prod']['DbName'],
-                                             g_conf.SystemUser,
-                                             g_conf.SystemUserPassword)
-        except Exception as e:
-            self.gp_prod_conn = None
+            with os.fdopen(fd, 'wb') as f_out:
+                pickle.dump(header, f_out, protocol=SNAPSHOT_PICKLE_PROTOCOL)
+                pickle.dump(self.__getstate__(), f_out, protocol=SNAPSHOT_PICKLE_PROTOCOL)
+            os.replace(tmp_path, snapshot_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load_snapshot(cls, snapshot_path: str) -> 'SASpackage':
+        """Загружу пакет из снимка, сохраненного dump_snapshot.
+
+        Конструктор не вызывается (Consul и GP не трогаем), подключения к GP откроются при первом обращении.
+
+        :param snapshot_path: путь к файлу снимка
+        :return: экземпляр пакета
+        """
+        with open(snapshot_path, 'rb') as f_in:
+            header = pickle.load(f_in)
+            if not isinstance(header, dict) or header.get('format') != SNAPSHOT_FORMAT_NAME:
+                raise PackageSnapshotError(f'File {snapshot_path} is not a package snapshot')
+            if header.get('version') != SNAPSHOT_FORMAT_VERSION or header.get('class') != cls.__name__:
+                raise PackageSnapshotError(f'Snapshot {snapshot_path} has version {header.get("version")} of '
+                                           f'{header.get("class")}, expected version {SNAPSHOT_FORMAT_VERSION} '
+                                           f'of {cls.__name__}')
+            state = pickle.load(f_in)
+
+        package = cls.__new__(cls)
+        package.__setstate__(state)
+        return package
 
     def init_type(self):
         self.type = 'SAS'
 
     def _init_with_old_svn_api(self):
-        self._pack = Package(self.name, self.path, enviroment.local['paths']['TempPath'])
+        self._pack = Package(self.name, self.path, enviroment.local['paths']['TempPath'],
+                             file_catalog=self.file_catalog)
 
     def _init_with_chimera(self):
         self._pack = PackageChimeraAdapter(self.name, self.path, enviroment.local['paths']['TempPath'])
 
     def _get_cut2_settings_from_Chimera(self):
-        api = ChimeraApi()
-        self.cut2_settings = [Cut2Settings(obj["name"], type="cut2") for obj in api.get_package_objects(self.name)['items'] if
+        objects = self._pack.getChimeraObjects(ChimeraApi())
+        self.cut2_settings = [Cut2Settings(obj["name"], type="cut2") for obj in objects['items'] if
                               obj["plugin"] == "cut2"]
 
     def init_package_object(self):
@@ -251,16 +435,13 @@ class SASpackage(BasePackage):
             self._init_with_old_svn_api()
         else:
             self._init_with_chimera()
-        self.sas_scripts = [os.path.join(root_directory, file) for root_directory, child_directories, files in
-                            os.walk(self.path) for file in files if
-                            file.endswith('.sas') and os.path.relpath(root_directory, self.path).split(os.sep)[
-                                        0] != 'backup']
+        self.sas_scripts = [file.path for file in
+                            self.file_catalog.getFiles(extension='sas', exclude_top_directories=('backup',))]
         if self._chimera_use == 'no':
             self.chimera_sql_scripts = []
             self.chimera_dlh_sql_scripts = []
-            self.cut2_settings = [Cut2Settings(os.path.join(root_directory, file)) for root_directory, child_directories, files in
-                                  os.walk(os.path.join(self.path, 'release', 'cut2')) for file in files if
-                                  file.endswith('.json')]
+            self.cut2_settings = [Cut2Settings(file.path) for file in
+                                  self.file_catalog.getFiles(extension='json', under=os.path.join('release', 'cut2'))]
 
         else:
             files = ChimeraCollector.get_task_files(self.name, filter='.sql')
@@ -315,7 +496,10 @@ class SASpackage(BasePackage):
     def _get_all_dd_relations(self):
         names = self.get_all_package_objects_names()
         mg_helper = self._get_mg_utils_depence()
-        relations_raw = mg_helper.get_all_relations_objects_by_names(names)
+        return self._build_dd_relations(mg_helper.get_all_relations_objects_by_names(names))
+
+    @staticmethod
+    def _build_dd_relations(relations_raw) -> dict:
         all_relations = dict()
         for raw in relations_raw:
             if not all_relations.get(raw['entity_name']):
@@ -351,10 +535,9 @@ class SASpackage(BasePackage):
 
         return all_relations
 
+    @cached_method()
     def get_all_package_object_relations_from_dd(self):
-        if not self.__cashed_dd_relations:
-            self.__cashed_dd_relations = self._get_all_dd_relations()
-        return self.__cashed_dd_relations
+        return self._get_all_dd_relations()
 
     def get_modify_tables_from_scripts(self):
         modified_tables = set()
@@ -399,42 +582,34 @@ class SASpackage(BasePackage):
         return modified_tables
 
     @catch_problem
+    @cached_method()
     def get_table_phys_in_pack(self):
-        if self.__cashed_table_phys_in_pack:
-            return self.__cashed_table_phys_in_pack
-        else:
-            gp_tables = self.getMetaObjects('GpTable{}')
-            gp_tables_phys = set()
-            for table in gp_tables:
-                if '_utl_md.' not in table.Name:
-                    gp_tables_phys.add(table.Name.replace('<>', self.table_factory.prefix))
-
-            modified_tables = self.get_modify_tables_from_scripts()
+        gp_tables = self.getMetaObjects('GpTable{}')
+        gp_tables_phys = set()
+        for table in gp_tables:
+            if '_utl_md.' not in table.Name:
+                gp_tables_phys.add(table.Name.replace('<>', self.table_factory.prefix))
 
-            all_tables = modified_tables | gp_tables_phys
+        modified_tables = self.get_modify_tables_from_scripts()
 
-            self.__cashed_table_phys_in_pack = all_tables
+        all_tables = modified_tables | gp_tables_phys
 
-            return all_tables
+        return all_tables
 
     @catch_problem
+    @cached_method()
     def get_dlh_table_phys_in_pack(self):
-        if self.__cashed_dlh_table_phys_in_pack:
-            return self.__cashed_dlh_table_phys_in_pack
-        else:
-            dlh_tables = self.getMetaObjects('DlhTable{}')
-            dlh_tables_phys = set()
-            for table in dlh_tables:
-                if '_utl_md.' not in table.Name:
-                    dlh_tables_phys.add(table.Name.replace('<>', self.table_factory.prefix))
-
-            modified_tables = self.get_modify_dlh_tables_from_scripts()
+        dlh_tables = self.getMetaObjects('DlhTable{}')
+        dlh_tables_phys = set()
+        for table in dlh_tables:
+            if '_utl_md.' not in table.Name:
+                dlh_tables_phys.add(table.Name.replace('<>', self.table_factory.prefix))
 
-            all_tables = modified_tables | dlh_tables_phys
+        modified_tables = self.get_modify_dlh_tables_from_scripts()
 
-            self.__cashed_dlh_table_phys_in_pack = all_tables
+        all_tables = modified_tables | dlh_tables_phys
 
-            return all_tables
+        return all_tables
 
     @property
     def obsolete_jobs_load_params(self):
@@ -542,17 +717,12 @@ class SASpackage(BasePackage):
         :param: scripts_directory - имя папки в пакете, по умолчанию - 'release'
         :return: список, пример: [before_import_ch.sql, create_tales_ch.sql]
         """
-        scripts_path: List[str] = []
-
         search_dir = os.path.join(self.path, scripts_directory)
         # если scripts_directory не существует, ищем по всему пакету
-        work_dir = search_dir if os.path.exists(search_dir) and os.path.isdir(search_dir) else self.path
+        under = scripts_directory if os.path.exists(search_dir) and os.path.isdir(search_dir) else None
 
-        # рекурсивно обходим вложенные папки и достаем .sql скрипты
-        for root, dirs, files in os.walk(work_dir):
-            for file in files:
-                if file.endswith(".sql"):
-                    scripts_path.append(os.path.join(root, file))
+        # .sql скрипты из всех вложенных папок берем из каталога файлов пакета
+        scripts_path: List[str] = [file.path for file in self.file_catalog.getFiles(extension='sql', under=under)]
         return scripts_path
 
     @catch_problem
@@ -605,19 +775,15 @@ class SASpackage(BasePackage):
         """
         table_results: List[str] = []
 
-        try:
-            with open(r'{0}/{1}'.format(self.path, pack_path.bckp_ddl)) as f:
-                ddl_text = f.read()
-            try:
-                gp_table = [tbl.split(';')[0].split('.')[1] for tbl in ddl_text.split('-- DROP TABLE ')[1:]]
-            except IndexError:
-                gp_table: List[str] = []
-        except FileNotFoundError:
+        dropped_tables = self.backup_ddl_index.get_dropped_tables()
+        if all('.' in table for table in dropped_tables):
+            gp_table = [table.split('.')[1] for table in dropped_tables]
+        else:
             gp_table: List[str] = []
 
-        meta_old_paths = [options['additional_options']['old_meta_name_and_path'] for options in self._pack._TaskList
-                          if options['name'] == 'AlterMetadata' and 'Tables' in options['additional_options'][
-                              'old_meta_name_and_path']]
+        meta_old_paths = [options['additional_options']['old_meta_name_and_path'] for options in
+                          self._pack.getTasksByName('AlterMetadata')
+                          if 'Tables' in options['additional_options']['old_meta_name_and_path']]
 
         meta_names = [(path.split('/')[-1].replace(' ', '_').lower(),
                        SASNameTransfer.get_lib_name_by_meta_name(path.split('/')[2])) for path in meta_old_paths]
@@ -639,33 +805,32 @@ class SASpackage(BasePackage):
         prefix = get_prefix(self._contour, self.name)
 
         try:
-            query_all_tables = """
-            select 
-            b.table_full_name
-            from test_aru.at_phys_data a 
-            join  test_aru.bfr_translation b on a.backup_key=b.table_backup_key
-            where a.task_id = '{0}'
+            # таблицы задачи, которых нет в каталоге (одним запросом вместо select ... limit 0 по каждой таблице)
+            query_missing_tables = """
+            select t.table_name
+            from (
+                select replace(b.table_full_name, 'prod_', '{1}_') as table_name
+                from test_aru.at_phys_data a
+                join test_aru.bfr_translation b on a.backup_key = b.table_backup_key
+                where a.task_id = '{0}'
+            ) t
+            left join pg_catalog.pg_namespace n
+                on n.nspname = lower(split_part(t.table_name, '.', 1))
+            left join pg_catalog.pg_class c
+                on c.relnamespace = n.oid
+                and c.relname = lower(split_part(t.table_name, '.', 2))
+            where c.oid is null
             ;
-            """.format(prefix[2:])
-
-            tables = [table[0].replace('prod_', '{0}_'.format(prefix)) for table in
-                      self.GPConnection.executeAndReturnLists(query_all_tables)]
+            """.format(prefix[2:], prefix)
 
-            gp_table: List[str] = []
-            for table in tables:
-                query_select = """
-                select * from {0} limit 0;
-                """.format(table)
-                try:
-                    self.GPConnection.executeAndReturnLists(query_select)
-                except Exception:
-                    gp_table.append(table.split('.')[1])
+            gp_table: List[str] = [table[0].split('.')[1] for table in
+                                   self.GPConnection.executeAndReturnLists(query_missing_tables)]
         except Exception:
             gp_table: List[str] = []
 
-        meta_old_paths = [options['additional_options']['old_meta_name_and_path'] for options in self._pack._TaskList
-                          if options['name'] == 'AlterMetadata' and 'Tables' in options['additional_options'][
-                              'old_meta_name_and_path']]
+        meta_old_paths = [options['additional_options']['old_meta_name_and_path'] for options in
+                          self._pack.getTasksByName('AlterMetadata')
+                          if 'Tables' in options['additional_options']['old_meta_name_and_path']]
 
         meta_names = [(path.split('/')[-1].replace(' ', '_').lower(),
                        SASNameTransfer.get_lib_name_by_meta_name(path.split('/')[2])) for path in meta_old_paths]
@@ -689,7 +854,7 @@ class SASpackage(BasePackage):
 
     @catch_problem
     def _find_old_name_by_chimera(self, new_name: str) -> str:
-        objects = ChimeraApi().get_package_objects(self.name)
+        objects = self._pack.getChimeraObjects(ChimeraApi())
         if objects.get('items'):
             for item in objects['items']:
                 if item.get('new_name'):
@@ -710,20 +875,13 @@ class SASpackage(BasePackage):
         :return: имя объекта до переименования.
             Пример: 'marti_load_usr_web_ast_pds_collect_calls'
         """
+        return self._pack.getNameBeforeAlter(current_name, self._get_renaming_filter(obj_type))
+
+    def _get_renaming_filter(self, obj_type: str) -> str:
         if self._chimera_use == 'yes':
-            obj_filter = obj_type + '{}'
+            return obj_type + '{}'
         else:
-            obj_filter = obj_type.capitalize() + '{!o}'
-
-        obj_lst = self.getMetaObjectsBeforeAlter(obj_filter)
-        old_name = None
-        if obj_lst:
-            for obj in obj_lst:
-                if obj.Name and obj.NewMetaObject.Name == current_name:
-                    old_name = obj.Name
-                    break
-
-        return old_name
+            return obj_type.capitalize() + '{!o}'
 
     @catch_problem
     def get_job_name_before_renaming(self, current_name: str) -> Optional[str]:
@@ -785,16 +943,74 @@ class SASpackage(BasePackage):
 
     @catch_problem
     def _cash_depend_jobs_deploys(self, dep_job_list):
-        for job in dep_job_list:
-
-            if not self.__cashed_jobs_deploys.get(job):
-                parser = ParseDeployAndCheck(job, False, 'vial')
-
-                try:
-                    code = parser.get_deploy_code_from_etl_repository()
-                    self.__cashed_jobs_deploys[job] = code
-                except Exception as e:
-                    pass
+        # код запрашивается параллельно, ошибки остаются в deploy_code_store.errors
+        for job, code in self.deploy_code_store.fetch(dep_job_list).items():
+            if code:
+                self.__cashed_jobs_deploys[job] = code
+
+    @staticmethod
+    def _get_job_targets(mg_helper: MgReplicaGpHelper, prod_job_name: str) -> Set[str]:
+        return {t[0] for t in mg_helper.get_target_phys_by_job_name(prod_job_name)}
+
+    @staticmethod
+    def _get_target_depend_etl_objects(mg_helper: MgReplicaGpHelper, target: str) -> List[Tuple[str, str]]:
+        urn = mg_helper.get_urn_of_object(target)
+        if urn:
+            return mg_helper.get_depend_etl_objects_by_urn(urn[0][0])
+        return []
+
+    @staticmethod
+    def _get_relations_destinations(mg_helper: MgReplicaGpHelper, names: Set[str], entity_type: str) \
+            -> Dict[str, List[Tuple[str, str]]]:
+        """Одним запросом к MG реплике верну для каждого объекта типа entity_type его приемники (имя, тип).
+
+        Объектов, которых нет в реплике, в результате нет. Связи одноименных объектов других типов отбрасываю.
+
+        :param mg_helper: помощник MG реплики
+        :param names: имена объектов
+        :param entity_type: тип объектов в MG, например 'JOB' или 'TABLE'
+        :return: словарь {имя объекта: [(имя приемника, тип приемника)]}
+        """
+        if not names:
+            return {}
+
+        relations_raw = [raw for raw in mg_helper.get_all_relations_objects_by_names(names)
+                         if raw['entity_type'] == entity_type]
+        relations = SASpackage._build_dd_relations(relations_raw)
+        return {name: [(destination['name'], destination['type'])
+                       for destinations in relation['destinations'].values()
+                       for destination in destinations['objects']]
+                for name, relation in relations.items()}
+
+    def _get_jobs_targets_and_depend_objects(self, mg_helper: MgReplicaGpHelper, prod_job_names: List[str]) \
+            -> Tuple[Dict[str, Set[str]], Dict[str, List[Tuple[str, str]]]]:
+        """Верну таргеты джобов и зависимые от таргетов ETL-объекты.
+
+        Связи всех джобов, а затем всех таргетов, получаю одним запросом к реплике на каждый шаг: таргеты джоба -
+        его приемники-таблицы, зависимые объекты таргета - его приемники, которые не являются таблицами.
+        Джобы и таргеты, которых в ответе нет, разрешаю прежним способом, по одному.
+
+        :param mg_helper: помощник MG реплики
+        :param prod_job_names: имена джобов на проде
+        :return: ({джоб: таргеты}, {таргет: [(имя зависимого объекта, тип)]})
+        """
+        jobs = set(prod_job_names)
+        jobs_destinations = self._get_relations_destinations(mg_helper, jobs, MG_JOB_TYPE)
+        targets_by_job = {job: {name for name, destination_type in destinations
+                                if name and destination_type == MG_TABLE_TYPE}
+                          for job, destinations in jobs_destinations.items()}
+        for job in jobs - set(targets_by_job):
+            targets_by_job[job] = self._get_job_targets(mg_helper, job)
+
+        all_targets = {t for targets in targets_by_job.values() for t in targets if len(t.split('.')) > 1}
+        targets_destinations = self._get_relations_destinations(mg_helper, all_targets, MG_TABLE_TYPE)
+        depend_objects_by_target = {target: [(name, destination_type) for name, destination_type in destinations
+                                             if destination_type != MG_TABLE_TYPE]
+                                    for target, destinations in targets_destinations.items()}
+        for target in all_targets - set(depend_objects_by_target):
+            depend_objects_by_target[target] = self._get_target_depend_etl_objects(mg_helper, target)
+
+        return targets_by_job, depend_objects_by_target
 
     @catch_problem
     def get_table_with_depend_jobs_mg(self) -> Dict[str, List[str]]:
@@ -813,12 +1029,15 @@ class SASpackage(BasePackage):
         else:
             exclude_jobs = None
 
-        for job in jobs:
-            # на случай переименования объектов получаем имена до переименования
-            prod_job_name = self.get_job_name_before_renaming(job)
+        # на случай переименования объектов получаем имена до переименования
+        prod_job_names = [self.get_job_name_before_renaming(job) for job in jobs]
+
+        # через MG реплики для джобов получаем таргеты и зависимые от них объекты на проде
+        targets_by_job, depend_objects_by_target = self._get_jobs_targets_and_depend_objects(mg_helper,
+                                                                                              prod_job_names)
 
-            # через MG реплики для джоба получаем таргеты
-            job_targets = {t[0] for t in mg_helper.get_target_phys_by_job_name(prod_job_name)}
+        for prod_job_name in prod_job_names:
+            job_targets = targets_by_job[prod_job_name]
             for t in job_targets:
                 # получаем имя таблицы в формате либа.таблица, т.к. дальше зависимости используются в таком виде
                 splits = t.split('.')
@@ -835,12 +1054,8 @@ class SASpackage(BasePackage):
 
                     lib_n = str.format('{0}.{1}', SASNameTransfer.get_lib_name_by_meta_name(meta_schema),
                                        splits[1].upper())
-                    # через MG получаем список зависимых на проде
-                    urn = mg_helper.get_urn_of_object(t)
-                    if urn:
-                        list = mg_helper.get_depend_etl_objects_by_urn(urn[0][0])
-                    else:
-                        list = []
+                    # зависимые на проде
+                    list = depend_objects_by_target[t]
                     dep_jobs_list = []
                     for el in list:
                         try:
@@ -860,48 +1075,93 @@ class SASpackage(BasePackage):
                         except KeyError:
                             dep_jobs_list = []
                     if dep_jobs_list:
-                        self._cash_depend_jobs_deploys(dep_jobs_list)
                         result_dic[lib_n] = dep_jobs_list
+
+        # код деплоя всех зависимых джобов получаем за один параллельный проход
+        self._cash_depend_jobs_deploys([job for dep_jobs_list in result_dic.values() for job in dep_jobs_list])
         return result_dic
 
-    def _get_mg_utils_depence(self):
-        togle = FeaturesTogles()
-        if togle.dd_replica_usage == 'test':
+    @staticmethod
+    def _get_mg_replica_source() -> str:
+        return 'test' if FeaturesTogles().dd_replica_usage == 'test' else 'prod'
+
+    def _get_mg_utils_depence(self, replica_source: Optional[str] = None):
+        if (replica_source or self._get_mg_replica_source()) == 'test':
             return MgReplicaGpHelper(self.GPConnection, schema='test_aru')
         else:
             return MgReplicaGpHelper(self.gp_prod_conn)
 
-    @catch_problem
-    def _get_depend_tedi_dags_from_gp_source(self, gp_source):
-        mg_helper = self._get_mg_utils_depence()
+    @staticmethod
+    def _get_prod_table_name(table_name: str) -> str:
+        return table_name.replace('test_', 'prod_', 1) if table_name.startswith('test_') else table_name
+
+    def _resolve_tables_urns_batch(self, mg_helper: MgReplicaGpHelper, replica_source: str,
+                                   prod_tables: Set[Tuple[str, str]]):
+        """Одним запросом к MG реплике найду URN таблиц и положу их в кэш пакета.
 
-        table = gp_source.replace('test_', 'prod_', 1) if gp_source.startswith('test_') else gp_source
-        urn_list = mg_helper.get_urn_of_object(table)
-        all_depend_etl_objects_by_urn = []
-        if urn_list:
-            for urn in urn_list:
-                table_urn = urn[0]
-                if UrnPrefixes.UrnGpPrefix.value in table_urn:
-                    all_depend_etl_objects_by_urn = mg_helper.get_depend_etl_objects_by_urn(table_urn)
-                    break
-        dep_dags_list = [etl_object[0] for etl_object in all_depend_etl_objects_by_urn if etl_object[1] == 'DAG']
-        return dep_dags_list
+        Таблицы, которых нет в ответе, в кэш не попадают.
+
+        :param mg_helper: помощник MG реплики
+        :param replica_source: реплика, к которой относится mg_helper (test или prod)
+        :param prod_tables: множество (имя таблицы на проде, тип таблицы gp/dlh)
+        """
+        table_types = {prod_name: set() for prod_name, _ in prod_tables}
+        for prod_name, table_type in prod_tables:
+            table_types[prod_name].add(table_type)
+
+        for raw in mg_helper.get_all_relations_objects_by_names(set(table_types)):
+            urn = raw['urn']
+            for table_type in table_types.get(raw['entity_name'], ()):
+                if urn and self.URN_PREFIXES_BY_TABLE_TYPE[table_type].value in urn:
+                    self._table_urns.setdefault((replica_source, raw['entity_name'], table_type), urn)
+
+    def _resolve_table_urn(self, mg_helper: MgReplicaGpHelper, replica_source: str,
+                           prod_table: Tuple[str, str]) -> Optional[str]:
+        prod_name, table_type = prod_table
+        for urn in mg_helper.get_urn_of_object(prod_name) or []:
+            if self.URN_PREFIXES_BY_TABLE_TYPE[table_type].value in urn[0]:
+                # не найденные URN не кэшируем, таблица может появиться в реплике позже
+                self._table_urns[(replica_source,) + prod_table] = urn[0]
+                return urn[0]
+        return None
 
     @catch_problem
-    def _get_depend_tedi_dag_from_dlh_source(self, dlh_source):
-        mg_helper = self._get_mg_utils_depence()
+    def get_dags_depend_on_tables(self, tables: List[Tuple[str, str]]) -> Dict[Tuple[str, str], List[str]]:
+        """Верну для каждой таблицы список имён дагов на проде, у которых эта таблица является одним из источников.
 
-        table = dlh_source.replace('test_', 'prod_', 1) if dlh_source.startswith('test_') else dlh_source
-        urn_list = mg_helper.get_urn_of_object(table)
-        all_depend_etl_objects_by_urn = []
-        if urn_list:
-            for urn in urn_list:
-                table_urn = urn[0]
-                if UrnPrefixes.UrnDlhPrefix.value in table_urn:
-                    all_depend_etl_objects_by_urn = mg_helper.get_depend_etl_objects_by_urn(table_urn)
-                    break
-        dep_dags_list = [etl_object[0] for etl_object in all_depend_etl_objects_by_urn if etl_object[1] == 'DAG']
-        return dep_dags_list
+        Таблицы gp и dlh можно передавать вместе: URN всех таблиц, которых еще нет в кэше пакета, ищутся одним
+        запросом к MG реплике, не найденные в нем таблицы - по одной. Зависимые даги запрашиваются по URN,
+        как и раньше, по одному разу на URN.
+
+        :param tables: список (имя таблицы, тип таблицы gp или dlh)
+        :return: словарь {(имя таблицы, тип таблицы): список имён дагов}
+        """
+        replica_source = self._get_mg_replica_source()
+        mg_helper = self._get_mg_utils_depence(replica_source)
+        prod_tables = {table: (self._get_prod_table_name(table[0]), table[1]) for table in tables}
+
+        not_resolved = {prod_table for prod_table in prod_tables.values()
+                        if (replica_source,) + prod_table not in self._table_urns}
+        if not_resolved:
+            self._resolve_tables_urns_batch(mg_helper, replica_source, not_resolved)
+
+        result: Dict[Tuple[str, str], List[str]] = {}
+        for table, prod_table in prod_tables.items():
+            table_urn = self._table_urns.get((replica_source,) + prod_table)
+            if table_urn is None:
+                table_urn = self._resolve_table_urn(mg_helper, replica_source, prod_table)
+
+            if table_urn is None:
+                result[table] = []
+                continue
+
+            if (replica_source, table_urn) not in self._depend_dags_by_urn:
+                self._depend_dags_by_urn[(replica_source, table_urn)] = [
+                    etl_object[0] for etl_object in mg_helper.get_depend_etl_objects_by_urn(table_urn)
+                    if etl_object[1] == 'DAG']
+            result[table] = list(self._depend_dags_by_urn[(replica_source, table_urn)])
+
+        return result
 
     @catch_problem
     def get_dags_depend_on_table(self, table_name: str, table_type: str = 'gp') -> List[str]:
@@ -911,24 +1171,28 @@ class SASpackage(BasePackage):
         :param table_type: тип таблицы, gp или dlh
         :return: список имён дагов
         """
-        if table_type == 'gp':
-            return self._get_depend_tedi_dags_from_gp_source(table_name)
-        elif table_type == 'dlh':
-            return self._get_depend_tedi_dag_from_dlh_source(table_name)
+        if table_type in self.URN_PREFIXES_BY_TABLE_TYPE:
+            return self.get_dags_depend_on_tables([(table_name, table_type)])[(table_name, table_type)]
 
     @catch_problem
-    def _get_tedi_dag(self, dag_name: str) -> TediDag:
+    def _get_tedi_dag(self, dag_name: str, contour: Optional[str] = None,
+                      custom_config_for_tedi_api=None) -> TediDag:
         """Создам и верну объект класса TediDag, соответствующий переданному имени дага.
 
         :param dag_name: имя дага
+        :param contour: контур BigTedi (по умолчанию - TediDag.contour_default)
+        :param custom_config_for_tedi_api: конфиг BigTedi (по умолчанию - TediDag.custom_tedi_api_conf)
         :return: экземпляр класса TediDag
         """
         if dag_name.startswith('manual_'):
-            tedi_dag = TediDag(dag_name, branch=self.name, use_tedi_api=False, lazy=False)
+            tedi_dag = TediDag(dag_name, branch=self.name, use_tedi_api=False, lazy=False, contour=contour,
+                               custom_config_for_tedi_api=custom_config_for_tedi_api)
             if not tedi_dag.meta:
-                tedi_dag = TediDag(dag_name, branch='test', use_tedi_api=False, lazy=False, strong_branch=True)
+                tedi_dag = TediDag(dag_name, branch='test', use_tedi_api=False, lazy=False, strong_branch=True,
+                                   contour=contour, custom_config_for_tedi_api=custom_config_for_tedi_api)
         else:
-            tedi_dag = TediDag(dag_name, branch=self.name)
+            tedi_dag = TediDag(dag_name, branch=self.name, contour=contour,
+                               custom_config_for_tedi_api=custom_config_for_tedi_api)
 
         return tedi_dag
 
@@ -972,6 +1236,7 @@ class SASpackage(BasePackage):
         return  self._get_dag_targets(dag_name)
 
     @catch_problem
+    @cached_method(key=filters_cache_key)
     def get_dags_with_target_tables(self, filters: str = 'Dag{}') -> Dict[str, List[str]]:
         """Верну словарь, в котором ключами являются имена дагов из пакета, отобранные по фильтру.
         А значениями по ключу являются списки таблиц приемников этих дагов.
@@ -982,8 +1247,7 @@ class SASpackage(BasePackage):
         package_dags = [dag.Name for dag in self.getMetaObjects(filters)]
         dags_with_target_tables = dict()
 
-        for dag in package_dags:
-            target_tables = self.get_dag_targets(dag)
+        for dag, target_tables in self._get_dags_targets(package_dags).items():
             # На уровне дагов нет деления на DLH/GP и тд, поэтому считаем,
             # что если нет GP-таргета, то даг не возвращаем
             if target_tables:
@@ -992,6 +1256,7 @@ class SASpackage(BasePackage):
         return dags_with_target_tables
 
     @catch_problem
+    @cached_method(key=filters_cache_key)
     def get_dags_with_dlh_target_tables(self, filters: str = 'Dag{}') -> Dict[str, List[str]]:
         """Верну словарь, в котором ключами являются имена дагов из пакета, отобранные по фильтру.
         А значениями по ключу являются списки таблиц приемников этих дагов.
@@ -1002,8 +1267,7 @@ class SASpackage(BasePackage):
         package_dags = [dag.Name for dag in self.getMetaObjects(filters)]
         dags_with_target_tables = dict()
 
-        for dag in package_dags:
-            target_tables = self.get_dag_dlh_targets(dag)
+        for dag, target_tables in self._get_dags_dlh_targets(package_dags).items():
             # На уровне дагов нет деления на DLH/GP и тд, поэтому считаем,
             # что если нет DLH-таргета, то даг не возвращаем
             if target_tables:
@@ -1011,6 +1275,7 @@ class SASpackage(BasePackage):
         return dags_with_target_tables
 
     @catch_problem
+    @cached_method(key=filters_cache_key)
     def get_targets_gptables_with_dep_dags(self, filters: str = 'Dag{}') -> Dict[str, List[str]]:
         """Верну словарь, в котором ключами являются имена gp-таблиц. Эти gp-таблицы, в свою очередь,
         являются приемниками для дагов из пакета, отобранных по переданному фильтру.
@@ -1021,14 +1286,11 @@ class SASpackage(BasePackage):
             зависящих от этих таблиц
         """
         dags_with_target_tables = self.get_dags_with_target_tables(filters)
-        targets_with_depend_dags = dict()
+        target_tables = [(table, 'gp') for dag in dags_with_target_tables.keys()
+                         for table in dags_with_target_tables[dag]]
+        depend_dags = self.get_dags_depend_on_tables(target_tables) or {}
 
-        for dag in dags_with_target_tables.keys():
-            target_tables = dags_with_target_tables[dag]
-            for table in target_tables:
-                targets_with_depend_dags[table] = self.get_dags_depend_on_table(table)
-
-        return targets_with_depend_dags
+        return {table: depend_dags.get((table, table_type), []) for table, table_type in target_tables}
 
     def get_dag_dlh_targets(self, dag: str):
         """Получаем DLH таргеты дага"""
@@ -1037,7 +1299,41 @@ class SASpackage(BasePackage):
 
         return target_tables
 
+    @staticmethod
+    def _raise_dag_load_errors(loaded_dags: Dict[str, DagLoadResult]) -> Dict[str, List[str]]:
+        """Верну результаты загрузки дагов, а если какой-то даг загрузить не удалось - подниму его ошибку,
+        как при последовательной загрузке (первую по порядку дагов).
+
+        :param loaded_dags: результат load_tedi_dags
+        :return: словарь с именами дагов и результатами action
+        """
+        dags_values = dict()
+        for dag, loaded_dag in loaded_dags.items():
+            if loaded_dag.error:
+                raise loaded_dag.error
+            dags_values[dag] = loaded_dag.value
+        return dags_values
+
+    def _get_dags_targets(self, dag_names: List[str]) -> Dict[str, List[str]]:
+        """Параллельно получу таблицы приемники дагов.
+
+        :param dag_names: имена дагов
+        :return: словарь с именами дагов и списком их таблиц приемников
+        """
+        return self._raise_dag_load_errors(load_tedi_dags(dag_names, self._get_tedi_dag,
+                                                          action=self._get_tedi_dag_targets))
+
+    def _get_dags_dlh_targets(self, dag_names: List[str]) -> Dict[str, List[str]]:
+        """Параллельно получу DLH таргеты дагов.
+
+        :param dag_names: имена дагов
+        :return: словарь с именами дагов и списком их DLH таргетов
+        """
+        return self._raise_dag_load_errors(load_tedi_dags(dag_names, self._get_tedi_dag,
+                                                          action=lambda tedi_dag: tedi_dag.get_dlh_targets()))
+
     @catch_problem
+    @cached_method(key=filters_cache_key)
     def get_targets_dlhtables_with_dep_dags(self, filters: str = 'Dag{}') -> Dict[str, List[str]]:
         """Верну словарь, в котором ключами являются имена dlh-таблиц. Эти dlh-таблицы, в свою очередь,
         являются приемниками для дагов из пакета, отобранных по переданному фильтру.
@@ -1047,24 +1343,23 @@ class SASpackage(BasePackage):
         :return: словарь с именами gp-таблиц, являющихся приемниками дагов из пакета, и списком дагов с прода,
             зависящих от этих таблиц
         """
-        if not self.__cashed_targets_dlhtables_with_dep_dags:
-            package_dags = [dag.Name for dag in self.getMetaObjects(filters)]
-            dags_with_dlh_target_tables = dict()
-            targets_with_depend_dags = dict()
+        package_dags = [dag.Name for dag in self.getMetaObjects(filters)]
+        dags_with_dlh_target_tables = dict()
+        targets_with_depend_dags = dict()
 
-            for dag in package_dags:
-                target_tables = self.get_dag_dlh_targets(dag)
-                dags_with_dlh_target_tables[dag] = target_tables
+        for dag, target_tables in self._get_dags_dlh_targets(package_dags).items():
+            dags_with_dlh_target_tables[dag] = target_tables
 
-            for dag in dags_with_dlh_target_tables.keys():
-                target_tables = dags_with_dlh_target_tables[dag]
-                for table in target_tables:
-                    targets_with_depend_dags[table] = self.get_dags_depend_on_table(table, table_type='dlh')
+        target_tables = [(table, 'dlh') for dag in dags_with_dlh_target_tables.keys()
+                         for table in dags_with_dlh_target_tables[dag]]
+        depend_dags = self.get_dags_depend_on_tables(target_tables) or {}
+        for table, table_type in target_tables:
+            targets_with_depend_dags[table] = depend_dags.get((table, table_type), [])
 
-            self.__cashed_targets_dlhtables_with_dep_dags = targets_with_depend_dags
-        return self.__cashed_targets_dlhtables_with_dep_dags
+        return targets_with_depend_dags
 
     @catch_problem
+    @cached_method(key=filters_cache_key)
     def get_targets_gptables_with_old_names(self, filters: str = 'Dag{}') -> Dict[str, List[str]]:
         """Верну словарь, в котором ключами являются имена gp-таблиц. Эти gp-таблицы, в свою очередь,
         являются приемниками для дагов из пакета, отобранных по переданному фильтру.
@@ -1096,15 +1391,7 @@ class SASpackage(BasePackage):
         """
         spk_name = 'release/spk/job-{0}.spk'.format(job_name.replace(' ', '-').lower())
 
-        root = self._base_spk_extract_and_parse(spk_name, 'TransportMetadata.xml')
-        attr_lines = {}
-        for src_code in root.iter('Extension'):
-            try:
-                attr_lines[src_code.attrib['Name']] = src_code.attrib['Value']
-            except KeyError as e:
-                pass
-
-        return attr_lines
+        return dict(self._get_spk_facts(spk_name).extension_attributes)
 
     @catch_problem
     def get_depend_jobs_by_table(self, table: str, prefix: str) -> List[str]:
@@ -1124,16 +1411,15 @@ class SASpackage(BasePackage):
         dep_jobs_set = set()
         if dep_dict and isinstance(dep_dict, Dict):
             all_dep_jobs = set([el for val in dep_dict.values() for el in val])
+            store = self.contour_deploy_code_store
+            deploy_codes = store.fetch(all_dep_jobs)
+            errors = store.errors
             for job in all_dep_jobs:
-                # main=False т.к. джобы зависимые!
-                tech_job = self.job_factory(job, '', main=False, countour=self._contour)
-                try:
-                    deploy_code = tech_job.get_deploy_code()
-                except (NoDeploy, CantGetDeployFromRepository):
-                    deploy_code = ''
-                finally:
-                    if not deploy_code:
-                        dep_jobs_set.add(job)
+                error = errors.get(job)
+                if job not in deploy_codes and not isinstance(error, (NoDeploy, CantGetDeployFromRepository)):
+                    raise error
+                if not deploy_codes.get(job):
+                    dep_jobs_set.add(job)
         return dep_jobs_set
 
 
@@ -1145,12 +1431,7 @@ class SASpackage(BasePackage):
         :return DDL text или ''
         """
         try:
-            with open(os.path.join(self.path, pack_path.bckp_ddl), errors='ignore') as ddl_file:
-                readed_bckp_tables = ddl_file.read().split('-- ')[1:]
-                for table_ddl in readed_bckp_tables:
-                    if table + ';' in table_ddl:
-                        return table_ddl
-                return ''
+            return self.backup_ddl_index.get_table_ddl(table)
         except IOError:
             return ''
 
@@ -1237,43 +1518,91 @@ class SASpackage(BasePackage):
         return self._getRename_tables()
 
     def get_targets_gptables_with_dags(self):
-        if not self.__cashed_targets_gptables_with_dep_dags:
-            self.__cashed_targets_gptables_with_dep_dags = self.get_targets_gptables_with_dep_dags()
-        return self.__cashed_targets_gptables_with_dep_dags
+        return self.get_targets_gptables_with_dep_dags()
 
     def get_targets_dlh_tables_with_dags(self):
         return self.get_targets_dlhtables_with_dep_dags()
 
+    @cached_method()
     def getTargetsWithDepJobs(self) -> Dict[str, List[str]]:
-        if not self.__cashed_TargetsWithDepJobsMG:
-            self.__cashed_TargetsWithDepJobsMG = self.get_table_with_depend_jobs_mg()
-        return self.__cashed_TargetsWithDepJobsMG
+        return self.get_table_with_depend_jobs_mg()
 
     @catch_problem
-    def _extract_spk(self, spk_file: str, xml_to_extract: str):
-        rand_str = ''.join(random.choice(string.ascii_lowercase) for _ in range(10))
-        z = zipfile.ZipFile(os.path.join(self.path, spk_file), 'r')
-        xml_path = z.extract(xml_to_extract, os.path.join(self.path, rand_str))
-
-        unix_permission_cmd = "chmod -R 777 {0}".format(os.path.join(self.path, rand_str))
-        rc_permission, permission_log = SystemCommand.execute(unix_permission_cmd)
+    def _read_spk(self, spk_file: str, xml_to_extract: str) -> bytes:
+        """
+        Прочитаю xml из spk файла внутри пакета в память, не распаковывая архив на диск
+        :param spk_file: имя spk файла вместе с путем внутри пакета
+        :param xml_to_extract: xml файл внутри архива
+        :return содержимое xml
+        """
+        with zipfile.ZipFile(os.path.join(self.path, spk_file), 'r') as z:
+            return z.read(xml_to_extract)
 
-        return xml_path
+    @staticmethod
+    def _extract_spk_facts(xml_content: bytes) -> SpkFacts:
+        """
+        За один потоковый проход по TransportMetadata.xml соберу все, что нужно анализатору пакета.
+        Обработанные элементы сразу очищаются, поэтому дерево целиком в памяти не строится
+        :param xml_content: содержимое xml
+        """
+        columns = set()
+        code_lines = set()
+        extension_attributes = {}
+        sticky_note = None
+
+        depth = 0
+        root = None
+        for event, elem in etree.iterparse(io.BytesIO(xml_content), events=('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    root = elem
+                depth += 1
+                continue
+
+            depth -= 1
+            if elem.tag == 'Column':
+                column_name = elem.get('SASColumnName')
+                if column_name is not None:
+                    columns.add(column_name.lower())
+            elif elem.tag == 'TextStore':
+                # Берем только те тэги <TextStore>, в имени которые есть слово code, т.к. именно там хранится
+                # (пре / пост) код джоба / трансформа, код UW-тр. Например: Name - "SourceCode", "UserWrittenSourceCode".
+                name, stored_text = elem.get('Name'), elem.get('StoredText')
+                if name is not None and stored_text is not None and 'code' in name.lower():
+                    code_lines.add(stored_text.lower())
+            elif elem.tag == 'Extension':
+                name, value = elem.get('Name'), elem.get('Value')
+                if name is not None and value is not None:
+                    extension_attributes[name] = value
+
+            if sticky_note is None:
+                attr_with_sticker = elem.get('DefaultValue')
+                if isinstance(attr_with_sticker, str):
+                    sticker = re_find(r'<text>.*cut.*2.*</text>', attr_with_sticker.lower())
+                    if sticker:
+                        sticky_note = sticker[0]
+
+            elem.clear()
+            # дочерние элементы корня после обработки больше не нужны
+            if depth == 1:
+                root.clear()
+
+        return SpkFacts(frozenset(columns), frozenset(code_lines), tuple(extension_attributes.items()), sticky_note)
+
+    @cached_method(maxsize=SPK_CACHE_SIZE)
+    def _read_spk_facts(self, spk_file: str, spk_mtime: int) -> SpkFacts:
+        # время изменения spk входит в ключ кэша: измененный архив будет прочитан заново
+        return self._extract_spk_facts(self._read_spk(spk_file, 'TransportMetadata.xml'))
 
     @catch_problem
-    def _base_spk_extract_and_parse(self, spk_file: str, xml_to_extract: str):
+    def _get_spk_facts(self, spk_file: str) -> SpkFacts:
         """
-        Разархивирую spk файл внутри пакета и распарсю необходимый xml внутри архива
+        Верну факты из TransportMetadata.xml spk файла пакета. Результат кэшируется по (spk, время изменения spk)
         :param spk_file: имя spk файла вместе с путем внутри пакета
-        :param xml_to_extract: xml файл, который надо распарсить
-        :return список колонок
         """
-        xml_path = self._extract_spk(spk_file, xml_to_extract)
-
-        tree = etree.parse(xml_path)
-        root = tree.getroot()
+        spk_mtime = os.stat(os.path.join(self.path, spk_file)).st_mtime_ns
 
-        return root
+        return self._read_spk_facts(spk_file, spk_mtime)
 
     @catch_problem
     def get_columns_from_spk_file(self, table_name: str, from_buffer=False) -> Set[str]:
@@ -1286,15 +1615,7 @@ class SASpackage(BasePackage):
         dir = 'buffer' if from_buffer else 'release/spk'
         spk_name = '{0}/table-{1}.spk'.format(dir, table_name.replace(' ', '-').lower())
 
-        root = self._base_spk_extract_and_parse(spk_name, 'TransportMetadata.xml')
-        meta_columns = set()
-        for column in root.iter('Column'):
-            try:
-                meta_columns.add(column.attrib['SASColumnName'].lower())
-            except Exception as e:
-                pass
-
-        return meta_columns
+        return set(self._get_spk_facts(spk_name).columns)
 
     @catch_problem
     def get_job_code_from_spk_file(self, job_name: str) -> Set[str]:
@@ -1305,35 +1626,15 @@ class SASpackage(BasePackage):
         """
         spk_name = 'release/spk/job-{0}.spk'.format(job_name.replace(' ', '-').lower())
 
-        root = self._base_spk_extract_and_parse(spk_name, 'TransportMetadata.xml')
-        code_lines = set()
-        for src_code in root.iter('TextStore'):
-            try:
-                # Берем только те тэги <TextStore>, в имени которые есть слово code, т.к. именно там хранится (пре / пост) код джоба / трансформа, код UW-тр.
-                # Например: Name - "SourceCode", "UserWrittenSourceCode".
-                if 'code' in src_code.attrib['Name'].lower():
-                    code_lines.add(src_code.attrib['StoredText'].lower())
-            except Exception as e:
-                pass
-
-        return code_lines
+        return set(self._get_spk_facts(spk_name).code_lines)
 
     @catch_problem
     def get_sticky_note_with_cut2(self, job_name: str):
         """
         Верну '<text>cut2</text>' если стикер с кат2 найден
         """
-        sticker = None
         spk_name = 'release/spk/job-{0}.spk'.format(job_name.replace(' ', '-').lower())
-        xml_path = self._extract_spk(spk_name, 'TransportMetadata.xml')
-        for event, elem in etree.iterparse(xml_path):
-            attr_with_sticker = elem.get('DefaultValue')
-            if isinstance(attr_with_sticker, str):
-                attr_with_sticker = attr_with_sticker.lower()
-                sticker = re_find(r'<text>.*cut.*2.*</text>', attr_with_sticker)
-                if sticker:
-                    return sticker[0]
-        return sticker
+        return self._get_spk_facts(spk_name).sticky_note
 
     def _get_phys_name_for_table_with_sas_lib(self, table: str):
         prefix = get_prefix(self._contour, self.name)
@@ -1364,29 +1665,77 @@ class SASpackage(BasePackage):
 
         return phys_name
 
+    @staticmethod
+    def _get_gp_task_stage(prefix: str) -> str:
+        if prefix.startswith('t'):
+            return 'test'
+        elif prefix.startswith('pl'):
+            return 'prodlike'
+        else:
+            return 'dev'
+
+    @cached_method()
+    def get_vial_object_index(self, plugin: str, task_stage: str) -> VialObjectIndex:
+        """
+        Верну индекс vial-объектов пакета для плагина и стадии, объекты запрашиваются в Chimera один раз
+        :param plugin: плагин, gp или dlh
+        :param task_stage: стадия задачи, например - test, prodlike, dev
+        """
+        return VialObjectIndex(ChimeraApi().get_vial_objects(self.name, f'{plugin}.{task_stage}.{self.name}'))
+
+    def _get_gp_columns_with_types(self, tables: List[List[str]]):
+        """
+        Верну колонки таблиц GP из каталога (pg_attribute/pg_class/pg_type): строки
+        (схема.таблица, колонка, data_type, character_maximum_length), типы - как в information_schema.columns.
+        Таблицы передаются в запрос списком VALUES, порциями по GP_COLUMNS_QUERY_CHUNK таблиц
+        :param tables: список [схема, таблица]
+        """
+        tables = list(dict.fromkeys((schema, table) for schema, table in tables))
+        for chunk_start in range(0, len(tables), GP_COLUMNS_QUERY_CHUNK):
+            values = ',\n'.join("('{0}', '{1}')".format(schema.replace("'", "''"), table.replace("'", "''"))
+                                for schema, table in tables[chunk_start:chunk_start + GP_COLUMNS_QUERY_CHUNK])
+            query = f"""
+            select v.table_schema || '.' || v.table_name as tab,
+                   a.attname as column_name,
+                   case when t.typtype = 'd' then
+                            case when bt.typelem <> 0 and bt.typlen = -1 then 'ARRAY'
+                                 when nbt.nspname = 'pg_catalog' then format_type(t.typbasetype, null)
+                                 else 'USER-DEFINED' end
+                        else
+                            case when t.typelem <> 0 and t.typlen = -1 then 'ARRAY'
+                                 when nt.nspname = 'pg_catalog' then format_type(a.atttypid, null)
+                                 else 'USER-DEFINED' end
+                   end as data_type,
+                   information_schema._pg_char_max_length(information_schema._pg_truetypid(a.*, t.*),
+                                                          information_schema._pg_truetypmod(a.*, t.*))
+                       as character_maximum_length
+            from (values
+            {values}
+            ) as v(table_schema, table_name)
+            join pg_catalog.pg_namespace n on n.nspname = v.table_schema
+            join pg_catalog.pg_class c on c.relnamespace = n.oid and c.relname = v.table_name
+            join pg_catalog.pg_attribute a on a.attrelid = c.oid and a.attnum > 0 and not a.attisdropped
+            join pg_catalog.pg_type t on t.oid = a.atttypid
+            join pg_catalog.pg_namespace nt on nt.oid = t.typnamespace
+            left join pg_catalog.pg_type bt on t.typtype = 'd' and bt.oid = t.typbasetype
+            left join pg_catalog.pg_namespace nbt on nbt.oid = bt.typnamespace
+            where c.relkind in ('r', 'v', 'f', 'p')
+            order by 1, a.attnum
+            ;
+            """
+            for row in self.GPConnection.executeAndReturnLists(query):
+                yield row
+
     def _get_all_columns_with_types(self, contour_prefix=None):
         try:
             tables_with_columns = dict()
             prefix = self.table_factory.prefix
-            if prefix.startswith('t'):
-                task_stage = 'test'
-            elif prefix.startswith('pl'):
-                task_stage = 'prodlike'
-            else:
-                task_stage = 'dev'
-            gp_vial_objects = ChimeraApi().get_vial_objects(self.name, f'gp.{task_stage}.{self.name}')
-            tables = [table["name"].replace('<>_', f'{prefix}_').split('.') for table in gp_vial_objects["items"]]
-            bckp_tables = [table["backup_id"].split('.') for table in gp_vial_objects["items"] if table["backup_id"]]
+            gp_vial_objects = self.get_vial_object_index('gp', self._get_gp_task_stage(prefix))
+            tables = [table["name"].replace('<>_', f'{prefix}_').split('.') for table in gp_vial_objects.items]
+            bckp_tables = [table["backup_id"].split('.') for table in gp_vial_objects.items if table["backup_id"]]
             all_tables = tables + bckp_tables
-            query = """select a.table_schema || '.' || a.table_name as tab, a.column_name, a.data_type, a.character_maximum_length
-                        from information_schema.columns as a
-                        where 
-                        """
-            params = ' or '.join([f"(a.table_schema = '{a}' and a.table_name = '{b}')" for a, b in all_tables])
-
-            res = self.GPConnection.executeAndReturnLists(query + params + ';')
 
-            for row in res:
+            for row in self._get_gp_columns_with_types(all_tables):
                 if not tables_with_columns.get(row[0]):
                     tables_with_columns[row[0]] = []
                 tables_with_columns[row[0]].append((row[1], row[2], row[3]))
@@ -1396,6 +1745,15 @@ class SASpackage(BasePackage):
             a = dict()
             return a
 
+    @cached_method(key=dlh_columns_cache_key)
+    def _get_dlh_columns_full_info(self, table: str, spark_sql: SparkSQL) -> dict:
+        """
+        Верну полную информацию о колонках DLH таблицы (результат SparkSQL.get_columns_full_info)
+        :param table: имя таблицы, например - test_tab.table_name
+        :param spark_sql: клиент SparkSQL, через который идет запрос
+        """
+        return spark_sql.get_columns_full_info(table)
+
     def _get_all_columns_with_types_for_dlh(self, contour_prefix=None):
         try:
             tables_with_columns = dict()
@@ -1404,14 +1762,34 @@ class SASpackage(BasePackage):
                 task_stage = 'dev'
             else:
                 task_stage = 'test'
-            dlh_vial_objects = ChimeraApi().get_vial_objects(self.name, f'dlh.{task_stage}.{self.name}')
-            tables = [table["name"].replace('<>_', f'{prefix}_').split('.') for table in dlh_vial_objects["items"]]
-            bckp_tables = [table["backup_id"].split('.') for table in dlh_vial_objects["items"] if table["backup_id"]]
+            dlh_vial_objects = self.get_vial_object_index('dlh', task_stage)
+            tables = [table["name"].replace('<>_', f'{prefix}_').split('.') for table in dlh_vial_objects.items]
+            bckp_tables = [table["backup_id"].split('.') for table in dlh_vial_objects.items if table["backup_id"]]
             all_tables = tables + bckp_tables
-            spark_sql = SparkSQL()
-            for table in all_tables:
-                columns_full_info = spark_sql.get_columns_full_info(f'{table[0]}.{table[1]}')
-                tables_with_columns.update(columns_full_info)
+            table_names = list(dict.fromkeys(f'{table[0]}.{table[1]}' for table in all_tables))
+            if not table_names:
+                return tables_with_columns
+
+            # клиент SparkSQL не потокобезопасен: каждый поток работает через свой клиент,
+            # клиенты закрываются после завершения пула. Результат по каждой таблице кэшируется
+            worker_clients = threading.local()
+            spark_sql_clients: List[SparkSQL] = []
+            spark_sql_clients_lock = threading.Lock()
+
+            def get_columns_full_info(table_name: str) -> dict:
+                if getattr(worker_clients, 'spark_sql', None) is None:
+                    worker_clients.spark_sql = SparkSQL()
+                    with spark_sql_clients_lock:
+                        spark_sql_clients.append(worker_clients.spark_sql)
+                return self._get_dlh_columns_full_info(table_name, worker_clients.spark_sql)
+
+            try:
+                with ThreadPoolExecutor(max_workers=min(DLH_COLUMNS_WORKERS, len(table_names))) as executor:
+                    for columns_full_info in executor.map(get_columns_full_info, table_names):
+                        tables_with_columns.update(columns_full_info)
+            finally:
+                for spark_sql in spark_sql_clients:
+                    close_spark_sql(spark_sql)
 
             return tables_with_columns
 
@@ -1419,17 +1797,16 @@ class SASpackage(BasePackage):
             a = dict()
             return a
 
+    @cached_method()
     def get_all_columns_with_types(self):
-        if not self.__cashed_columns_with_types:
-            self.__cashed_columns_with_types = self._get_all_columns_with_types()
-        return self.__cashed_columns_with_types
+        return self._get_all_columns_with_types()
 
+    @cached_method()
     def get_all_columns_with_types_for_dlh(self):
-        if not self.__cashed_columns_with_types_for_dlh:
-            self.__cashed_columns_with_types_for_dlh = self._get_all_columns_with_types_for_dlh()
-        return self.__cashed_columns_with_types_for_dlh
+        return self._get_all_columns_with_types_for_dlh()
 
     @catch_problem
+    @cached_method()
     def _get_changed_columns_for_dlh_table(self, table: str):
         """
         Parameters
@@ -1440,42 +1817,137 @@ class SASpackage(BasePackage):
         _______
         Массивы полей: добавленными, удаленными/измененными и ДО доработки
         """
-        if self.__cashed_ChangeColumsOfTables.get(table):
-            return self.__cashed_ChangeColumsOfTables.get(table)
-        else:
-            bckp_columns = {}
-            now_columns = {}
-            compare_ddl = CompareDdl()
-            try:
-                prefix = self.table_factory.dlh_prefix
-                table_detail = self.table_factory.generate_table_by_test_name(table, prefix, table_type='dlh')
-                table = self.table_factory()
-                phys_table = table.phys_name
-                now_columns = table_detail.get_columns_from_phys()
-                # пока хардкодим, но среды могут измениться
-                task_stage = 'prodlike'
-                bckup_name = None
-                dlh_vial_objects = ChimeraApi().get_vial_objects(self.name, f'dlh.{task_stage}.{self.name}')
-                for vial_obj in dlh_vial_objects['items']:
-                    # сравниваем имя таблицы с объектом из конфига
-                    if vial_obj['name'] == table:
-                        bckup_name = vial_obj['backup_id']
-                    else:
-                        # либо ищем имя физики в параметрах vial объекта
-                        if vial_obj.get('extra_params'):
-                            for param in vial_obj.get('extra_params'):
-                                if phys_table == param['value']:
-                                    bckup_name = vial_obj['backup_id']
-                if bckup_name:
-                    pref = bckup_name[:bckup_name[bckup_name.index('_'):]]
-                    bckp_table = self.table_factory.generate_table_by_test_name(bckup_name, pref, table_type='dlh')
-                    bckp_columns = bckp_table.get_columns_from_phys()
-            except Exception as e:
-                raise DlhTable.CantDetectColumnsOfPhysTable(f'Cant detect columns for dlh table - {table}: {e}')
-            finally:
-                all_columns = compare_ddl.find_add_drop_rename_columns(now_columns, bckp_columns)
-                self.__cashed_ChangeColumsOfTables[table] = all_columns
-                return self.__cashed_ChangeColumsOfTables[table]
+        bckp_columns = {}
+        now_columns = {}
+        compare_ddl = CompareDdl()
+        try:
+            prefix = self.table_factory.dlh_prefix
+            table_detail = self.table_factory.generate_table_by_test_name(table, prefix, table_type='dlh')
+            phys_table = table_detail.phys_name
+            now_columns = table_detail.get_columns_from_phys()
+            # пока хардкодим, но среды могут измениться
+            task_stage = 'prodlike'
+            # сравниваем имя таблицы с объектом из конфига, либо ищем имя физики в параметрах vial объекта
+            vial_obj = self.get_vial_object_index('dlh', task_stage).find_last(table, phys_table)
+            bckup_name = vial_obj['backup_id'] if vial_obj else None
+            if bckup_name:
+                pref = bckup_name[:bckup_name[bckup_name.index('_'):]]
+                bckp_table = self.table_factory.generate_table_by_test_name(bckup_name, pref, table_type='dlh')
+                bckp_columns = bckp_table.get_columns_from_phys()
+        except Exception as e:
+            raise DlhTable.CantDetectColumnsOfPhysTable(f'Cant detect columns for dlh table - {table}: {e}')
+        finally:
+            return compare_ddl.find_add_drop_rename_columns(now_columns, bckp_columns)
+
+    def _get_gp_columns_snapshot(self, tables: List[str]) -> Dict[str, Set[str]]:
+        """
+        Верну наборы колонок таблиц GP, полученные из каталога одним проходом.
+        Имена колонок - как в information_schema.columns.column_name, т.е. как их возвращает
+        CompareDdl.get_set_of_columns_for_given_table. Для таблиц, которых нет в каталоге, набор пустой
+        :param tables: имена таблиц, например - vld13111_emart.financial_transaction
+        """
+        columns = {table: set() for table in tables}
+        # в каталоге имена без кавычек хранятся в нижнем регистре
+        tables_by_catalog_name = dict()
+        for table in columns:
+            if '.' in table:
+                tables_by_catalog_name.setdefault(table.strip().lower(), []).append(table)
+
+        catalog_tables = [table.split('.', 1) for table in tables_by_catalog_name]
+        for row in self._get_gp_columns_with_types(catalog_tables):
+            for table in tables_by_catalog_name.get(row[0], []):
+                columns[table].add(row[1])
+        return columns
+
+    @cached_method()
+    def _get_package_columns_diffs(self) -> Dict[str, ColumnsDiff]:
+        compare_ddl = CompareDdl()
+        columns_diffs = dict()
+        try:
+            prefix = self.table_factory.prefix
+            phys_names = {table.Name: self._get_phys_name_for_gp_table_from_config(table.Name, prefix)
+                          for table in self.getMetaObjects('GpTable{}')}
+            if not phys_names:
+                return columns_diffs
+
+            if self._contour != 'test':
+                vial_objects = self.get_vial_object_index('gp', self._get_gp_task_stage(prefix))
+                bckp_tables = dict()
+                for table, phys_name in phys_names.items():
+                    vial_object = vial_objects.find_first(table, phys_name.replace(prefix, '<>'))
+                    if vial_object and vial_object['backup_id']:
+                        bckp_tables[table] = vial_object['backup_id']
+
+                snapshot = self._get_gp_columns_snapshot(list(phys_names.values()) + list(bckp_tables.values()))
+                bckp_columns = {table: snapshot[bckp_table] for table, bckp_table in bckp_tables.items()}
+            else:
+                # Для UNIT-теста бэкап берем из DDL пакета
+                snapshot = self._get_gp_columns_snapshot(list(phys_names.values()))
+                bckp_columns = {table: compare_ddl.getColumsFromDDLtext(phys_name,
+                                                                        self._getTableBckpDdl(phys_name, prefix))
+                                for table, phys_name in phys_names.items()}
+
+            for table, phys_name in phys_names.items():
+                # таблицы, которых (или бэкапа которых) не нашли в каталоге, сравниваются по одной через CompareDdl,
+                # чтобы имена, записанные в конфиге не так, как в каталоге, давали тот же результат, что и раньше
+                if not snapshot[phys_name] or not bckp_columns.get(table):
+                    continue
+                columns_diffs[table] = ColumnsDiff(*map(tuple, compare_ddl.find_add_drop_rename_columns(
+                    snapshot[phys_name], bckp_columns[table])))
+        except Exception as e:
+            print('LOG: Cant detect changed columns of package tables, they will be detected one by one: {0}'.format(e))
+            columns_diffs.clear()
+
+        return columns_diffs
+
+    def get_package_columns_diff(self) -> Mapping[str, ColumnsDiff]:
+        """
+        Верну изменения колонок GP таблиц пакета: имя таблицы из конфига -> ColumnsDiff.
+        Колонки таблиц и их бэкапов берутся из каталога GP одним запросом (для теста бэкап - из DDL пакета),
+        результат считается один раз и не изменяется. Таблиц, не найденных в каталоге, в результате нет
+        """
+        return MappingProxyType(self._get_package_columns_diffs())
+
+    def _get_changed_columns_for_gp_table(self, table: str, old_columns=None):
+        """
+        Сравню колонки GP таблицы с ее бэкапом (или с переданным набором полей ДО доработки)
+        :param table: имя таблицы из конфига
+        :param old_columns: набор полей ДО доработки (передается для Bind дагов)
+        """
+        bckp_columns = {}
+        now_columns = {}
+        compare_ddl = CompareDdl()
+        try:
+            prefix = self.table_factory.prefix
+            phys_name = self._get_phys_name_for_gp_table_from_config(table, prefix)
+            now_columns = compare_ddl.get_set_of_columns_for_given_table(phys_name)
+            if self._contour != 'test':
+                # Если аргумент не передан, значит это не Bind даг и набор полей получаем из бэкапа
+                if not old_columns:
+                    gp_vial_object = self.get_vial_object_index('gp', self._get_gp_task_stage(prefix)).find_first(
+                        table, phys_name.replace(prefix, '<>'))
+                    bckp_table = gp_vial_object['backup_id'] if gp_vial_object else None
+                    bckp_columns = compare_ddl.get_set_of_columns_for_given_table(bckp_table)
+                else:
+                    bckp_columns = old_columns
+            else:
+                # Для UNIT-теста
+                bckp_columns = compare_ddl.getColumsFromDDLtext(phys_name, self._getTableBckpDdl(phys_name, prefix))
+        except Exception as e:
+            raise TableDetail.CantDetectPhysTable(f'Cant detect phys for table (maybe this is not a GP-table). : {e}')
+        finally:
+            return compare_ddl.find_add_drop_rename_columns(now_columns, bckp_columns)
+
+    @cached_method()
+    def _get_gp_table_columns_diff(self, table: str) -> ColumnsDiff:
+        """
+        Верну изменения колонок GP таблицы: из посчитанного по всему пакету, иначе - сравнением таблицы по одной
+        :param table: имя таблицы из конфига
+        """
+        columns_diff = self.get_package_columns_diff().get(table)
+        if columns_diff is None:
+            columns_diff = ColumnsDiff(*map(tuple, self._get_changed_columns_for_gp_table(table)))
+        return columns_diff
 
     @catch_problem
     def getChangeColumsOfTable(self, table: str, table_type='GpTable', contour_prefix: Union[str, None] = None,
@@ -1493,46 +1965,12 @@ class SASpackage(BasePackage):
         Массивы полей: добавленными, удаленными/измененными и ДО доработки
         """
         if table_type == 'GpTable':
-            if self.__cashed_ChangeColumsOfTables.get(table):
-                return self.__cashed_ChangeColumsOfTables.get(table)
-
-            else:
-                bckp_columns = {}
-                now_columns = {}
-                compare_ddl = CompareDdl()
-                try:
-                    prefix = self.table_factory.prefix
-                    phys_name = self._get_phys_name_for_gp_table_from_config(table, prefix)
-                    now_columns = compare_ddl.get_set_of_columns_for_given_table(phys_name)
-                    if self._contour != 'test':
-                        # Если аргумент не передан, значит это не Bind даг и набор полей получаем из бэкапа
-                        if not old_columns:
-                            if prefix.startswith('t'):
-                                task_stage = 'test'
-                            elif prefix.startswith('pl'):
-                                task_stage = 'prodlike'
-                            else:
-                                task_stage = 'dev'
-
-                            gp_vial_objects = ChimeraApi().get_vial_objects(self.name, f'gp.{task_stage}.{self.name}')
-                            bckp_table = None
-                            for gp_vial_object in gp_vial_objects['items']:
-                                if table == gp_vial_object['name'] or \
-                                        phys_name.replace(prefix, '<>') == gp_vial_object['name']:
-                                    bckp_table = gp_vial_object['backup_id']
-                                    break
-                            bckp_columns = compare_ddl.get_set_of_columns_for_given_table(bckp_table)
-                        else:
-                            bckp_columns = old_columns
-                    else:
-                        # Для UNIT-теста
-                        bckp_columns = compare_ddl.getColumsFromDDLtext(phys_name, self._getTableBckpDdl(phys_name, prefix))
-                except Exception as e:
-                    raise TableDetail.CantDetectPhysTable(f'Cant detect phys for table (maybe this is not a GP-table). : {e}')
-                finally:
-                    all_columns = compare_ddl.find_add_drop_rename_columns(now_columns, bckp_columns)
-                    self.__cashed_ChangeColumsOfTables[table] = all_columns
-                    return self.__cashed_ChangeColumsOfTables[table]
+            # Для Bind дагов результат зависит от переданного набора полей ДО доработки и не кэшируется
+            if old_columns:
+                return self._get_changed_columns_for_gp_table(table, old_columns)
+            # из кэша - новые списки, чтобы изменения у вызывающего не попадали в кэш
+            added, changed, old = self._get_gp_table_columns_diff(table)
+            return list(added), list(changed), list(old)
         # ToDo поддержка типов таблиц, отличных от GP
         elif table_type == 'ClickHouse':
             return [], [], []
@@ -1559,8 +1997,9 @@ class SASpackage(BasePackage):
                 big_tedi_custom_contour = 'ProdlikeContour'
             tedi_api_conf = BigTediConfig(big_tedi_custom_contour, custom_url=devial_tedi_url)
             tedi_api_conf.is_meta_vial = True
-            TediDag.contour_default = big_tedi_custom_contour
-            TediDag.custom_tedi_api_conf = tedi_api_conf
+            with TEDI_DAG_INIT_LOCK:
+                TediDag.contour_default = big_tedi_custom_contour
+                TediDag.custom_tedi_api_conf = tedi_api_conf
 
         return TediDag
 
@@ -1604,4 +2043,5 @@ class Infomaticapackage(BasePackage):
 
     def init_package_object(self):
         self.init_type()
-        self._pack = Package(self.name, self.path, enviroment.local['paths']['TempPath'])
+        self._pack = Package(self.name, self.path, enviroment.local['paths']['TempPath'],
+                             file_catalog=self.file_catalog)
@@ -0,0 +1,118 @@
+from bisect import bisect_right
+from typing import Dict, List, Optional
+
+
+class BackupDdlIndex:
+    """
+    Индекс файла с DDL бэкапов таблиц пакета (pack_path.bckp_ddl).
+    Файл разбит на блоки комментариями '-- ', блок таблицы начинается с '-- DROP TABLE <схема>.<таблица>;'.
+    Файл читается целиком и индексируется один раз при первом обращении (дескриптор сразу закрывается):
+    границы блоков и таблица -> блок по заголовкам DROP TABLE. Текст блока декодируется только когда он запрошен
+    """
+    CHUNK_SEPARATOR = b'-- '
+    DROP_TABLE_HEADER = b'DROP TABLE '
+
+    def __init__(self, ddl_path: str):
+        self._ddl_path = ddl_path
+        self._data: Optional[bytes] = None
+        # начало (после '-- ') каждого блока
+        self._chunk_starts: Optional[List[int]] = None
+        self._chunk_by_table: Dict[str, int] = {}
+        self._dropped_tables: List[str] = []
+
+    def __getstate__(self) -> dict:
+        # содержимое файла и индекс не сериализуются, после загрузки файл будет прочитан заново при обращении
+        return {'_ddl_path': self._ddl_path}
+
+    def __setstate__(self, state: dict):
+        self.__init__(state['_ddl_path'])
+
+    def __enter__(self) -> 'BackupDdlIndex':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def ddl_path(self) -> str:
+        return self._ddl_path
+
+    def _get_data(self) -> bytes:
+        if self._data is None:
+            try:
+                with open(self._ddl_path, 'rb') as f_in:
+                    # переводы строк приводим к '\n', как при чтении в текстовом режиме
+                    self._data = f_in.read().replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+            except OSError:
+                self._data = b''
+        return self._data
+
+    def _load(self):
+        if self._chunk_starts is not None:
+            return
+
+        data = self._get_data()
+        chunk_starts = []
+        position = data.find(self.CHUNK_SEPARATOR)
+        while position != -1:
+            chunk_starts.append(position + len(self.CHUNK_SEPARATOR))
+            position = data.find(self.CHUNK_SEPARATOR, position + len(self.CHUNK_SEPARATOR))
+
+        for chunk_number, chunk_start in enumerate(chunk_starts):
+            if data[chunk_start:chunk_start + len(self.DROP_TABLE_HEADER)] == self.DROP_TABLE_HEADER:
+                name_start = chunk_start + len(self.DROP_TABLE_HEADER)
+                name_end = data.find(b';', name_start)
+                if name_end == -1:
+                    name_end = self._get_chunk_end(chunk_starts, chunk_number, data)
+                table = data[name_start:name_end].decode('utf-8', errors='ignore')
+                self._dropped_tables.append(table)
+                self._chunk_by_table.setdefault(table, chunk_number)
+
+        self._chunk_starts = chunk_starts
+
+    def _get_chunk_end(self, chunk_starts: List[int], chunk_number: int, data: bytes) -> int:
+        if chunk_number + 1 < len(chunk_starts):
+            return chunk_starts[chunk_number + 1] - len(self.CHUNK_SEPARATOR)
+        return len(data)
+
+    def _get_chunk_text(self, chunk_number: int) -> str:
+        data = self._get_data()
+        chunk_start = self._chunk_starts[chunk_number]
+        return data[chunk_start:self._get_chunk_end(self._chunk_starts, chunk_number, data)].decode(
+            'utf-8', errors='ignore')
+
+    def get_dropped_tables(self) -> List[str]:
+        """
+        Верну имена таблиц из заголовков '-- DROP TABLE <таблица>;' в порядке файла
+        """
+        self._load()
+        return list(self._dropped_tables)
+
+    def get_table_ddl(self, table: str) -> str:
+        """
+        Верну блок DDL таблицы (без ведущего '-- ') или '', если таблицы в файле нет.
+        Сначала ищу по заголовкам DROP TABLE, затем - первый блок, где встречается '<таблица>;'
+        :param table: имя таблицы, например - test_emart.financial_transaction
+        """
+        self._load()
+        chunk_number = self._chunk_by_table.get(table)
+        if chunk_number is not None:
+            return self._get_chunk_text(chunk_number)
+
+        position = self._get_data().find((table + ';').encode('utf-8'))
+        if position == -1:
+            return ''
+        chunk_number = bisect_right(self._chunk_starts, position) - 1
+        # текст до первого '-- ' в блоки не входит
+        if chunk_number < 0:
+            return ''
+        return self._get_chunk_text(chunk_number)
+
+    def close(self):
+        """
+        Освобожу прочитанное содержимое файла, индекс сбрасывается и при следующем обращении строится заново
+        """
+        self._data = None
+        self._chunk_starts = None
+        self._chunk_by_table = {}
+        self._dropped_tables = []
@@ -1,5 +1,7 @@
 import yaml
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum, EnumType
 
 from operator import itemgetter
@@ -8,7 +10,7 @@ from gitlab.exceptions import GitlabGetError
 from Framework.utils.Gitlab_etl_worker import GitlabMetaRepoFactory, NoSuchFileInRepo
 from Framework.utils.bigtedi_util import BigTediAPIClient
 
-from typing import List, Union, Dict, Any, overload, Tuple, Optional
+from typing import List, Union, Dict, Any, overload, Tuple, Optional, Callable, NamedTuple
 
 try:
     from typing import Literal
@@ -76,6 +78,71 @@ class DagNotInRepository(Exception):
     pass
 
 
+# сколько дагов загружаем одновременно (каждый даг - несколько запросов в BigTedi или GitLab)
+TEDI_DAG_LOAD_WORKERS = 8
+
+# под этой блокировкой фабрика дагов пакета (SASpackage.tedi_dag_factory) меняет настройки контура
+# в атрибутах класса TediDag, а load_tedi_dags их читает
+TEDI_DAG_INIT_LOCK = threading.RLock()
+
+
+class DagLoadResult(NamedTuple):
+    # загруженный даг, None - если даг создать не удалось
+    dag: Optional['TediDag']
+    # результат action над дагом
+    value: Any
+    # ошибка создания дага или action (например, DagNotInRepository)
+    error: Optional[Exception]
+
+
+def get_tedi_dag_settings() -> Dict[str, Any]:
+    """
+    Верну настройки контура BigTedi, с которыми сейчас создаются даги (атрибуты класса TediDag),
+    в виде аргументов конструктора TediDag: contour и custom_config_for_tedi_api
+    """
+    with TEDI_DAG_INIT_LOCK:
+        return {'contour': TediDag.contour_default, 'custom_config_for_tedi_api': TediDag.custom_tedi_api_conf}
+
+
+def load_tedi_dags(dag_names: List[str], dag_loader: Callable[..., 'TediDag'],
+                   action: Optional[Callable[['TediDag'], Any]] = None,
+                   max_workers: int = TEDI_DAG_LOAD_WORKERS) -> Dict[str, DagLoadResult]:
+    """
+    Параллельно загружу даги и, если передано, выполню над каждым action (например, получу таргеты).
+    Настройки контура BigTedi читаются один раз в вызывающем потоке и передаются в dag_loader явно,
+    поэтому потоки не зависят от того, как атрибуты класса TediDag меняются во время загрузки.
+    Ошибка одного дага не прерывает загрузку остальных, а сохраняется в его результате
+    :param dag_names: имена дагов
+    :param dag_loader: функция, создающая даг по имени и аргументам contour и custom_config_for_tedi_api
+        (например, фабрика дагов пакета)
+    :param action: функция над загруженным дагом, ее результат попадет в DagLoadResult.value
+    :param max_workers: максимальное количество одновременно загружаемых дагов
+    :return: словарь {имя дага: DagLoadResult} в порядке dag_names
+    """
+    settings = get_tedi_dag_settings()
+
+    def load(dag_name: str) -> DagLoadResult:
+        try:
+            dag = dag_loader(dag_name, **settings)
+        except Exception as e:
+            return DagLoadResult(None, None, e)
+
+        if action is None:
+            return DagLoadResult(dag, None, None)
+        try:
+            return DagLoadResult(dag, action(dag), None)
+        except Exception as e:
+            return DagLoadResult(dag, None, e)
+
+    unique_names = list(dict.fromkeys(dag_names))
+    if not unique_names:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(unique_names))) as executor:
+        results = executor.map(load, unique_names)
+        return dict(zip(unique_names, results))
+
+
 depend_dags_cash = {}
 
 
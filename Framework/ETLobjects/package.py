@@ -1,22 +1,263 @@
 import os
-from typing import List, Dict, Union
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Dict, Union, NamedTuple, Tuple, Optional
 from Framework.special_expansion.special_functions import catch_problem
 from Framework.special_expansion import allias_types
 from Framework.ETLobjects.package_object import PackageObject, PackageObjectsList
+from Framework.ETLobjects.package_catalog import PackageFileCatalog, PackageParseManifest, MetaEntry
+
+
+def intern_value(value: Optional[str]) -> Optional[str]:
+    """
+    Интернирую строку (тип, флаги, имя объекта), чтобы одинаковые значения у тысяч объектов пакета
+    хранились в памяти и в pickle один раз
+    """
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class MetaFilterClause(NamedTuple):
+    """
+    Один фильтр вида "Type{flag,!flag}" после разбора
+    """
+    meta_type: str
+    required_flags: Tuple[str, ...]
+    forbidden_flags: Tuple[str, ...]
+    # фильтр с флагом '!' без буквы не пропускает ни одного объекта
+    matches_nothing: bool
+
+    def match(self, meta_object: PackageObject) -> bool:
+        if self.matches_nothing:
+            return False
+        if self.meta_type != 'Meta' and meta_object.Type != self.meta_type:
+            return False
+
+        flags = meta_object.Flags or ''
+        return all(flags.find(flag) > -1 for flag in self.required_flags) and \
+            not any(flags.find(flag) > -1 for flag in self.forbidden_flags)
+
+
+class CompiledMetaFilter(NamedTuple):
+    """
+    Скомпилированный фильтр метаданных: набор фильтров, объединенных через '|'
+    """
+    source: str
+    clauses: Tuple[MetaFilterClause, ...]
+
+    def match(self, meta_object: PackageObject) -> bool:
+        return any(clause.match(meta_object) for clause in self.clauses)
+
+
+@lru_cache(maxsize=512)
+def compile_meta_filter(filters: str) -> CompiledMetaFilter:
+    """
+    Разберу строку фильтра метаданных один раз, повторные вызовы с той же строкой берутся из кэша.
+    :param filters: фильтр, например 'Dag{s,!n}|GpTable{b}', подробнее в Package._getMetaObjects
+    :return: скомпилированный фильтр
+    """
+    clauses: List[MetaFilterClause] = []
+    for filter in filters.split('|'):
+        meta_type = filter.split('{')[0]
+        required_flags: List[str] = []
+        forbidden_flags: List[str] = []
+        matches_nothing = False
+
+        for flag in filter.split('{')[-1].split('}')[0].split(','):
+            negative = flag.find('!') > -1
+            letters = flag.replace('!', '')
+            # пустой флаг есть в любой строке флагов: '{}' ничего не отсекает, а '{!}' отсекает всё
+            if not letters:
+                matches_nothing = matches_nothing or negative
+            elif negative:
+                forbidden_flags.append(letters)
+            else:
+                required_flags.append(letters)
+
+        clauses.append(MetaFilterClause(meta_type, tuple(required_flags), tuple(forbidden_flags), matches_nothing))
+
+    return CompiledMetaFilter(filters, tuple(clauses))
+
+
+class IndexedPackageObjectsList(PackageObjectsList):
+    """
+    Список объектов пакета со вторичными индексами по метаданным.
+    Индексы (по типу, по каждой букве флага, по имени) обновляются в addObject, поэтому отбор метаданных
+    по фильтру сводится к операциям над битовыми масками вместо полного перебора объектов
+    """
+
+    def __init__(self):
+        super(IndexedPackageObjectsList, self).__init__()
+        # метаобъекты в порядке добавления, позиция в списке - номер бита в масках
+        self._IndexedMeta: List[PackageObject] = []
+        self._AllMetaMask: int = 0
+        self._TypeMasks: Dict[str, int] = {}
+        self._FlagMasks: Dict[str, int] = {}
+        self._NameIndex: Dict[str, List[PackageObject]] = {}
+        self._FileTypeIndex: Dict[str, List[PackageObject]] = {}
+        # версия списка растет при каждом добавлении объекта, результаты фильтров прошлых версий не используются
+        self._Version: int = 0
+        self._FilterResults: Dict[str, Tuple[int, List[PackageObject]]] = {}
+
+    @property
+    def Version(self) -> int:
+        return self._Version
+
+    def addObject(self, package_object: PackageObject):
+        super(IndexedPackageObjectsList, self).addObject(package_object)
+        self._Version += 1
+
+        self._NameIndex.setdefault(self.normalizeName(package_object.Name), []).append(package_object)
+
+        if not package_object.MetaObject:
+            self._FileTypeIndex.setdefault((package_object.Type or '').lower(), []).append(package_object)
+        else:
+            bit = 1 << len(self._IndexedMeta)
+            self._IndexedMeta.append(package_object)
+            self._AllMetaMask |= bit
+            self._TypeMasks[package_object.Type] = self._TypeMasks.get(package_object.Type, 0) | bit
+            for flag in set(package_object.Flags or ''):
+                self._FlagMasks[flag] = self._FlagMasks.get(flag, 0) | bit
+
+    @staticmethod
+    def normalizeName(name: str) -> str:
+        return name.lower().strip()
+
+    def getObjectsByName(self, name: str) -> List[PackageObject]:
+        """
+        Верну объекты пакета (и файлы, и метаданные) по имени без учета регистра и пробелов по краям
+        :param name: имя объекта
+        """
+        return list(self._NameIndex.get(self.normalizeName(name), []))
+
+    def getObjectsByNames(self, names: List[str]) -> Dict[str, List[PackageObject]]:
+        """
+        За один проход найду объекты пакета для списка имен
+        :param names: список имен объектов
+        :return: словарь имя из names -> список найденных объектов (пустой, если объектов нет)
+        """
+        return {name: self.getObjectsByName(name) for name in names}
+
+    def getFilesByType(self, file_type: str) -> List[PackageObject]:
+        """
+        Верну файлы пакета по типу (расширению) без учета регистра
+        :param file_type: тип файла, например 'hat'
+        """
+        return list(self._FileTypeIndex.get(file_type.lower(), []))
+
+    def _getSubstringFlagMask(self, flags: str) -> int:
+        """
+        Маска метаобъектов, в строке флагов которых есть подстрока flags (для флагов длиннее одной буквы)
+        """
+        mask = 0
+        for position, meta_object in enumerate(self._IndexedMeta):
+            if (meta_object.Flags or '').find(flags) > -1:
+                mask |= 1 << position
+
+        return mask
+
+    def _getFlagMask(self, flags: str) -> int:
+        if len(flags) == 1:
+            return self._FlagMasks.get(flags, 0)
+        return self._getSubstringFlagMask(flags)
+
+    def getMetaMask(self, clause: MetaFilterClause) -> int:
+        """
+        Верну битовую маску метаобъектов, подходящих под один фильтр вида "Type{flag,!flag}"
+        :param clause: разобранный фильтр
+        """
+        if clause.matches_nothing:
+            return 0
+
+        mask = self._AllMetaMask if clause.meta_type == 'Meta' else self._TypeMasks.get(clause.meta_type, 0)
+
+        for flags in clause.required_flags:
+            if not mask:
+                break
+            mask &= self._getFlagMask(flags)
+
+        for flags in clause.forbidden_flags:
+            if not mask:
+                break
+            mask &= ~self._getFlagMask(flags)
+
+        return mask
+
+    def getMetaObjectsByMask(self, mask: int) -> List[PackageObject]:
+        """
+        Верну метаобъекты по битовой маске в порядке их добавления в пакет
+        """
+        result: List[PackageObject] = []
+        while mask:
+            lowest_bit = mask & -mask
+            result.append(self._IndexedMeta[lowest_bit.bit_length() - 1])
+            mask ^= lowest_bit
+
+        return result
+
+    def selectMetaObjects(self, filters: str) -> List[PackageObject]:
+        """
+        Верну метаобъекты по строке фильтра. Результат запоминается до следующего изменения списка
+        :param filters: фильтр, например 'Dag{s,!n}|GpTable{b}'
+        """
+        cached = self._FilterResults.get(filters)
+        if cached is None or cached[0] != self._Version:
+            compiled_filter = compile_meta_filter(filters)
+
+            # фильтры через '|' объединяются, поэтому объединяем их маски - дубликаты отсекаются сами собой
+            result_mask: int = 0
+            for clause in compiled_filter.clauses:
+                result_mask |= self.getMetaMask(clause)
+
+            cached = (self._Version, self.getMetaObjectsByMask(result_mask))
+            self._FilterResults[filters] = cached
+
+        # отдаю копию, чтобы вызывающий код не испортил закэшированный результат
+        return list(cached[1])
+
+
+class MetaRenameMap:
+    """
+    Соответствие метаобъектов до и после переименования.
+    Хранит объекты из списка до переименований по новому имени,
+    тип и флаги проверяются скомпилированным фильтром уже на найденных кандидатах
+    """
+
+    def __init__(self):
+        self._ByNewName: Dict[str, List[PackageObject]] = {}
+
+    def addPair(self, old_object: PackageObject, new_object: PackageObject):
+        self._ByNewName.setdefault(new_object.Name, []).append(old_object)
+
+    def getOldName(self, new_name: str, meta_filter: CompiledMetaFilter) -> Optional[str]:
+        """
+        Верну имя объекта до переименования по текущему имени или None, если объекта нет
+        """
+        for old_object in self._ByNewName.get(new_name, []):
+            if old_object.Name and meta_filter.match(old_object):
+                return old_object.Name
+
+        return None
 
 
 class Package:
     """
     Класс для работы с пакетом задачи (содержит в себе информацию об объектах). В том числе парсит пакет
     """
-
     def __init__(self, package_name: str, package_directory_path: str, work_directory_path: str,
-                 scenario: str = 'Release'):
+                 scenario: str = 'Release', file_catalog: Optional[PackageFileCatalog] = None):
         self._ThisPackage = PackageObject(package_name, work_directory_path, package_directory_path)
+        self._WorkDirectoryPath = work_directory_path
         self._Scenario = scenario
-        self._ObjectsList: PackageObjectsList = PackageObjectsList()
+        # каталог файлов пакета, если не передан - соберется при разборе пакета
+        self._FileCatalog = file_catalog
+        self._ObjectsList: IndexedPackageObjectsList = IndexedPackageObjectsList()
         self._MetaObjectsListBeforeAlter = None
+        self._RenameMap: Optional[MetaRenameMap] = None
         self._TaskList: allias_types.TaskList = []
+        # индексы тасков сценария: по имени и по паре (имя, позиция)
+        self._TaskIndex: Dict[str, allias_types.TaskList] = {}
+        self._TaskPositionIndex: Dict[Tuple[str, str], allias_types.TaskList] = {}
 
     @property
     def PackageName(self) -> str:
@@ -30,6 +271,10 @@ class Package:
     def ThisPackage(self) -> PackageObject:
         return self._ThisPackage
 
+    @property
+    def ParseManifestPath(self) -> str:
+        return os.path.join(self._WorkDirectoryPath, '{0}.parse_manifest'.format(self.PackageName))
+
     @property
     def BackupSpkFilesPath(self) -> str:
         path = os.path.join(self._ThisPackage.Path, 'backup')
@@ -47,7 +292,8 @@ class Package:
 
     def addMetaToPackage(self, name: str, location: str, path: str, flags: str, type: str, metaobject: bool,
                          phys_table: str):
-        new_object = PackageObject(name, location, path, flags, type, metaobject, phys_table)
+        new_object = PackageObject(intern_value(name), location, path, intern_value(flags), intern_value(type),
+                                   metaobject, phys_table)
         self._ObjectsList.addObject(new_object)
 
     def getObject(self, name) -> List[PackageObject]:
@@ -60,7 +306,8 @@ class Package:
         :param file_path: путь к файлу
         :param file_type: тип файла
         """
-        new_object = PackageObject(file_name, file_path, os.path.join(file_path, file_name), type=file_type.lower())
+        new_object = PackageObject(file_name, file_path, os.path.join(file_path, file_name),
+                                   type=intern_value(file_type.lower()))
         self._ObjectsList.addObject(new_object)
 
     def addTask(self, task_name: str, task_position: str, task_objects: List[str], additional_options: Dict[str, str]):
@@ -73,19 +320,33 @@ class Package:
         """
         task = {'name': task_name, 'position': task_position, 'objects': task_objects,
                 'additional_options': additional_options}
+        self._registerTask(task)
+
+    def _registerTask(self, task: Dict):
+        """
+        Добавлю таск в список тасков и в индексы по имени и позиции
+        :param task: таск в формате {'name': ..., 'position': ..., 'objects': ..., 'additional_options': ...}
+        """
         self._TaskList.append(task)
+        self._TaskIndex.setdefault(task.get('name'), []).append(task)
+        self._TaskPositionIndex.setdefault((task.get('name'), task.get('position')), []).append(task)
 
-    def getTasksByName(self, task_name: str) -> allias_types.TaskList:
+    def findTasks(self, task_name: str, task_position: str = None) -> allias_types.TaskList:
         """
+        Верну таски сценария по имени и, если передана, по позиции (в порядке следования в сценарии)
         :param task_name: имя таска
+        :param task_position: позиция таска в кастомном сценарии (по умолчанию None - любая позиция)
         """
-        tasks: allias_types.TaskList = []
+        if task_position is None:
+            return list(self._TaskIndex.get(task_name, []))
 
-        for task in self._TaskList:
-            if task.get('name') == task_name:
-                tasks.append(task)
+        return list(self._TaskPositionIndex.get((task_name, task_position), []))
 
-        return tasks
+    def getTasksByName(self, task_name: str) -> allias_types.TaskList:
+        """
+        :param task_name: имя таска
+        """
+        return self.findTasks(task_name)
 
     def getTaskObjects(self, task_name: str, task_position: str) -> List[str]:
         """
@@ -93,12 +354,9 @@ class Package:
         :param task_name: имя таска
         :param task_position: позиция таска в кастомном сценарии
         """
-        task_objects: List[str] = []
-        for task in self._TaskList:
-            if task.get('name') == task_name and task.get('position') == task_position:
-                task_objects = task.get('objects')
-
-        return task_objects
+        tasks = self.findTasks(task_name, task_position)
+        # если тасков с такой позицией несколько, то берем последний
+        return tasks[-1].get('objects') if tasks else []
 
     def getObjectsByTaskName(self, task_name: str) -> List[str]:
         """
@@ -106,9 +364,8 @@ class Package:
         :param task_name: имя таска
         """
         objects: List[str] = []
-        for task in self._TaskList:
-            if task.get('name') == task_name:
-                objects.extend(task.get('objects'))
+        for task in self.findTasks(task_name):
+            objects.extend(task.get('objects'))
 
         return objects
 
@@ -117,12 +374,7 @@ class Package:
         Возвращает список объектов additional_options из всех тасков с именем task_name
         :param task_name: имя таска в кастомном сценарии
         """
-        merged_objects: List[Dict[str, str]] = []
-        for task in self._TaskList:
-            if task.get('name') == task_name:
-                merged_objects.append(task.get('additional_options'))
-
-        return merged_objects
+        return [task.get('additional_options') for task in self.findTasks(task_name)]
 
     def splitMetaPath(self, meta_path: str) -> Union[str, List[str]]:
         meta_path_parts = meta_path.rsplit('/', 1)
@@ -130,7 +382,8 @@ class Package:
 
     @catch_problem
     def _findMetaObjectsBeforeAlter(self, meta_after_alter: List[PackageObject]):
-        self._MetaObjectsListBeforeAlter = PackageObjectsList()
+        self._MetaObjectsListBeforeAlter = IndexedPackageObjectsList()
+        self._RenameMap = MetaRenameMap()
         altered_meta_map: Dict[str, str] = {}
 
         for task in self.getTasksByName('AlterMetadata'):
@@ -145,14 +398,23 @@ class Package:
                 meta_path = meta_object.Path
 
             meta_location, meta_name = self.splitMetaPath(meta_path)
+            # объект не переименовывался - строку имени делим с объектом после переименований
+            meta_name = meta_object.Name if meta_name == meta_object.Name else intern_value(meta_name)
 
             object_before_alter = PackageObject(meta_name, meta_location, meta_path,  flags=meta_object.Flags,
                                                 type=meta_object.Type, metaobject=True, new_meta_object=meta_object)
             self._MetaObjectsListBeforeAlter.addObject(object_before_alter)
+            self._RenameMap.addPair(object_before_alter, meta_object)
             meta_object.OldMetaObject = object_before_alter
 
-    def parseConfig(self, config_file: PackageObject):
-        with open(config_file.Path, 'r') as f_in:
+    def _readConfigEntries(self, config_path: str) -> List[MetaEntry]:
+        """
+        Прочитаю записи метаданных из файла config.hat
+        :param config_path: путь к файлу
+        :return: список (имя, расположение, путь, флаги, тип)
+        """
+        entries: List[MetaEntry] = []
+        with open(config_path, 'r') as f_in:
             for line in f_in:
                 if len(line.strip()) > 0:
                     meta_path = line[:line.rindex('('):]
@@ -161,27 +423,68 @@ class Package:
                     meta_type = line.split('(')[-1].split(')')[0]
                     meta_flags = line.split('{')[-1].split('}')[0]
 
-                    print('Found meta object: {0}({1})'.format(meta_name, meta_type))
-                    new_meta_object = PackageObject(meta_name, meta_location, meta_path, flags=meta_flags,
-                                                    type=meta_type,
-                                                    metaobject=True)
+                    entries.append((intern_value(meta_name), meta_location, meta_path,
+                                    intern_value(meta_flags), intern_value(meta_type)))
+
+        return entries
+
+    @staticmethod
+    def _createConfigObjects(entries: List[MetaEntry]) -> List[PackageObject]:
+        meta_objects: List[PackageObject] = []
+        for meta_name, meta_location, meta_path, meta_flags, meta_type in entries:
+            print('Found meta object: {0}({1})'.format(meta_name, meta_type))
+            meta_objects.append(PackageObject(meta_name, meta_location, meta_path, flags=meta_flags,
+                                              type=meta_type,
+                                              metaobject=True))
+        return meta_objects
+
+    def parseConfig(self, config_file: PackageObject, manifest: Optional[PackageParseManifest] = None):
+        """
+        Прочитаю метаданные из файла config.hat.
+        :param config_file: файл config.hat
+        :param manifest: манифест прошлого разбора пакета - если файл не менялся, метаобъекты берутся из него
+        """
+        if manifest is None:
+            meta_objects = self._createConfigObjects(self._readConfigEntries(config_file.Path))
+        else:
+            fingerprint = manifest.fingerprint(config_file.Path)
+            meta_objects = manifest.getMetaObjects(config_file.Path, fingerprint)
+            if meta_objects is None:
+                meta_objects = self._createConfigObjects(self._readConfigEntries(config_file.Path))
+                manifest.setMetaObjects(config_file.Path, fingerprint, meta_objects)
+            else:
+                print('LOG: Metadata of "{0}" did not change, reused from manifest: {1}'.format(
+                    config_file.Path, len(meta_objects)))
 
-                    self._ObjectsList.addObject(new_meta_object)
+        for meta_object in meta_objects:
+            self._ObjectsList.addObject(meta_object)
 
     def parsePackage(self):
         """
         Парсим пакет задачи
         """
-        self._ObjectsList = PackageObjectsList()
+        self._ObjectsList = IndexedPackageObjectsList()
         print('Looking for files in a directory "{0}"'.format(self._ThisPackage.Path))
 
-        for dir, dirs, files in os.walk(self._ThisPackage.Path):
-            # Не заходим в каталог .svn
-            if dir.find('.svn') == -1:
-                for file_name in files:
-                    extension = file_name.split('.')[-1]
-                    new_object = PackageObject(file_name, dir, os.path.join(dir, file_name), type=extension.lower())
-                    self._ObjectsList.addObject(new_object)
+        # Каталог .svn пропускается при обходе
+        if self._FileCatalog is None:
+            self._FileCatalog = PackageFileCatalog.scan(self._ThisPackage.Path)
+
+        # манифест прошлого разбора: объекты тех же файлов и неизменившиеся метаданные берем из него
+        manifest = PackageParseManifest(self.ParseManifestPath)
+        manifest.load()
+
+        reused_files: int = 0
+        for catalog_file in self._FileCatalog.Files:
+            file_object = manifest.getFileObject(catalog_file.path)
+            if file_object is None:
+                file_object = PackageObject(catalog_file.name, catalog_file.directory, catalog_file.path,
+                                            type=intern_value(catalog_file.extension))
+                manifest.setFileObject(catalog_file.path, file_object)
+            else:
+                reused_files += 1
+            self._ObjectsList.addObject(file_object)
+        print('LOG: Files reused from manifest: {0}'.format(reused_files))
 
         # Находим файл config.hat чтобы прочитать метаданные
         if self._Scenario.startswith('DevialAction') or self._Scenario == 'BiSynchronize':
@@ -194,10 +497,13 @@ class Package:
 
         if len(config_files) > 0:
             for config_file in config_files:
-                self.parseConfig(config_file)
+                self.parseConfig(config_file, manifest)
         else:
             raise Exception('Not found file "config.hat"!')
 
+        manifest.setFiles(catalog_file.path for catalog_file in self._FileCatalog.Files)
+        manifest.save()
+
         meta_found: int = 0
         file_found: int = 0
 
@@ -224,7 +530,7 @@ class Package:
         return self._ObjectsList.getObjects()
 
     @catch_problem
-    def _getMetaObjects(self, objects_list: PackageObjectsList, filters: str) -> List[PackageObject]:
+    def _getMetaObjects(self, objects_list: IndexedPackageObjectsList, filters: str) -> List[PackageObject]:
         """
         Верну метаданные из objects_list по фильтру.
         :param filters: Фильтр, примеры:
@@ -238,40 +544,30 @@ class Package:
             "Meta{}" - все метаданные
         :return: список метаданных
         """
-        all_filters: allias_types.Filters = []
-        for filter in filters.split('|'):
-            filter_dict = {
-                'type': filter.split('{')[0],
-                'flags': filter.split('{')[-1].split('}')[0].split(',')
-            }
-            all_filters.append(filter_dict)
-
-        result: List[PackageObject] = []
-        for meta_object in objects_list.getMetaObjects():
-            for filter in all_filters:
-                if meta_object.Type == filter.get('type') or filter.get('type') == 'Meta':
-                    adding = True
-
-                    for flag in filter.get('flags'):
-                        if (flag.find('!') == -1 and meta_object.Flags.find(flag.replace('!', '')) == -1) or \
-                                (flag.find('!') > -1 and meta_object.Flags.find(flag.replace('!', '')) > -1):
-                            adding = False
-                            break
-
-                    if adding:
-                        if meta_object not in result:
-                            result.append(meta_object)
-
-        return result
+        return objects_list.selectMetaObjects(filters)
 
     def getMetaObjectsBeforeAlter(self, filters: str) -> List[PackageObject]:
         """
         Верну метаданные до переименований по фильтру.
         """
+        self._initMetaObjectsBeforeAlter()
+
+        return self._getMetaObjects(self._MetaObjectsListBeforeAlter, filters)
+
+    def _initMetaObjectsBeforeAlter(self):
         if self._MetaObjectsListBeforeAlter is None:
             self._findMetaObjectsBeforeAlter(self.getMetaObjects('Meta{}'))
 
-        return self._getMetaObjects(self._MetaObjectsListBeforeAlter, filters)
+    def getNameBeforeAlter(self, current_name: str, filters: str) -> Optional[str]:
+        """
+        Верну имя метаобъекта до переименований по его текущему имени.
+        :param current_name: текущее имя объекта
+        :param filters: фильтр, которому должен соответствовать объект до переименований, например 'Dag{!o}'
+        :return: имя до переименований или None, если такого объекта нет
+        """
+        self._initMetaObjectsBeforeAlter()
+
+        return self._RenameMap.getOldName(current_name, compile_meta_filter(filters))
 
     def getMetaObjects(self, filters: str) -> List[PackageObject]:
         """
@@ -286,11 +582,18 @@ class Package:
             :param type: тип файла (по умолчанию None)
             :return: список файлов
         """
+        if filename is not None:
+            candidates = [package_object for package_object in self._ObjectsList.getObjectsByName(filename)
+                          if not package_object.MetaObject and package_object.Name.lower() == filename.lower()]
+        elif type is not None:
+            return self._ObjectsList.getFilesByType(type)
+        else:
+            return list(self._ObjectsList.getFileObjects())
+
         result: List[PackageObject] = []
-        for package_object in self._ObjectsList.getFileObjects():
-            if filename is None or package_object.Name.lower() == filename.lower():
-                if type is None or type.lower() == package_object.Type.lower():
-                    result.append(package_object)
+        for package_object in candidates:
+            if type is None or type.lower() == (package_object.Type or '').lower():
+                result.append(package_object)
 
         return result
 
@@ -301,26 +604,46 @@ class Package:
             :param objects_list: список объектов (их имена), например: ['DDS LOAD MAILS', 'config.hat']
         """
         result: List[PackageObject] = []
-        all_objects_in_package = self._ObjectsList.getObjects()
+        objects_by_name = self._ObjectsList.getObjectsByNames(objects_list)
 
         for in_object in objects_list:
-            for package_object in all_objects_in_package:
-                if in_object.lower().strip() == package_object.Name.lower().strip():
-                    result.append(package_object)
+            result.extend(objects_by_name[in_object])
 
         return result
 
 
 class PackageChimeraAdapter(Package):
 
+    def __init__(self, package_name: str, package_directory_path: str, work_directory_path: str,
+                 scenario: str = 'Release', file_catalog: Optional[PackageFileCatalog] = None):
+        super(PackageChimeraAdapter, self).__init__(package_name, package_directory_path, work_directory_path,
+                                                    scenario, file_catalog)
+        # ответ Chimera с объектами пакета, запрашивается один раз
+        self._ChimeraObjects: Optional[dict] = None
+
+    def getChimeraObjects(self, chimera_api) -> dict:
+        """
+        Верну ответ Chimera с объектами пакета (get_package_objects). Запрос выполняется один раз,
+        дальше ответ переиспользуется при разборе пакета, поиске настроек cut2 и старых имен объектов
+        :param chimera_api: клиент Chimera
+        """
+        if self._ChimeraObjects is None:
+            self._ChimeraObjects = chimera_api.get_package_objects(self.PackageName)
+        return self._ChimeraObjects
+
     def parsePackage(self, chimera_api):
         """
         Парсим пакет задачи
         """
-        self._ObjectsList = PackageObjectsList()
+        self._ObjectsList = IndexedPackageObjectsList()
         print('Looking for objects in Chimera')
 
-        files = chimera_api.get_package_files(self.PackageName).get('items')
+        # файлы и объекты пакета запрашиваем параллельно, ждем самый медленный запрос, а не сумму
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            files_future = executor.submit(chimera_api.get_package_files, self.PackageName)
+            objects_future = executor.submit(self.getChimeraObjects, chimera_api)
+            files = files_future.result().get('items')
+            objects_future.result()
 
         if files:
             for file in files:
@@ -330,7 +653,7 @@ class PackageChimeraAdapter(Package):
                 location = file['path']
                 path = (location + '/' + name) if location else name
                 name_parts = name.rpartition('.')
-                file_ext = name_parts[2].lower() if name_parts[1] else None
+                file_ext = intern_value(name_parts[2].lower()) if name_parts[1] else None
                 new_object = PackageObject(name, location, path, type=file_ext)
                 self._ObjectsList.addObject(new_object)
 
@@ -351,8 +674,9 @@ class PackageChimeraAdapter(Package):
         print('LOG: Read metadata: {0}'.format(meta_found))
 
     def parseConfig(self, chimera_api):
-        self._MetaObjectsListBeforeAlter = PackageObjectsList()
-        task_objects = chimera_api.get_package_objects(self.PackageName).get('items')
+        self._MetaObjectsListBeforeAlter = IndexedPackageObjectsList()
+        self._RenameMap = MetaRenameMap()
+        task_objects = self.getChimeraObjects(chimera_api).get('items')
 
         types_matching = {'tedi': 'Dag',
                           'gp': 'GpTable',
@@ -370,13 +694,15 @@ class PackageChimeraAdapter(Package):
             flags = n_flag + ''
             for flag in task_object['flags']:
                 flags = flags + flag[0]
+            flags = intern_value(flags)
 
-            meta_name_new = task_object['name']
+            # без переименования старый и новый объект делят одну строку имени
+            meta_name_new = intern_value(task_object['name'])
             meta_name_old = meta_name_new
             if task_object.get('new_name'):
-                meta_name_new = task_object['new_name']
+                meta_name_new = intern_value(task_object['new_name'])
 
-            meta_type = types_matching.get(task_object['plugin'])
+            meta_type = intern_value(types_matching.get(task_object['plugin']))
             print('Found meta object: {0}({1})'.format(meta_name_new, meta_type))
 
             new_meta_object = PackageObject(meta_name_new, '', '', flags=flags, type=meta_type, metaobject=True)
@@ -387,6 +713,7 @@ class PackageChimeraAdapter(Package):
 
             self._ObjectsList.addObject(new_meta_object)
             self._MetaObjectsListBeforeAlter.addObject(old_meta_object)
+            self._RenameMap.addPair(old_meta_object, new_meta_object)
 
     def addTask(self, step_id: str, step_type: str, step_index: str, parameters: List[dict], stage: str, plugin: str, additional_options: Dict[str, str]):
         """
@@ -419,4 +746,4 @@ class PackageChimeraAdapter(Package):
         task_svn = {'name': task['type'], 'position': task['index'], 'objects': objects_svn,
                     'additional_options': additional_options_svn}
 
-        self._TaskList.append(task_svn)
+        self._registerTask(task_svn)
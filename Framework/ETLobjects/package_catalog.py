@@ -0,0 +1,228 @@
+import os
+import pickle
+import hashlib
+import tempfile
+from types import MappingProxyType
+from typing import Any, List, Dict, Tuple, Iterable, NamedTuple, Optional
+
+
+class CatalogFile(NamedTuple):
+    """
+    Файл пакета в каталоге
+    """
+    name: str
+    directory: str
+    path: str
+    # расширение в нижнем регистре (часть имени после последней точки, как в Package.parsePackage)
+    extension: str
+    # первая папка пути относительно корня пакета, '' для файлов в корне
+    top_directory: str
+
+
+class PackageFileCatalog:
+    """
+    Неизменяемый каталог файлов пакета, собранный за один обход каталога пакета.
+    Индексирован по расширению и по папке верхнего уровня, чтобы разные потребители (разбор пакета, поиск sas/sql
+    скриптов, настроек cut2) не обходили файловую систему каждый раз заново
+    """
+    # в эти каталоги не заходим
+    SKIPPED_DIRECTORIES = ('.svn',)
+
+    def __init__(self, root_path: str, files: Iterable[CatalogFile]):
+        self._RootPath = root_path
+        self._Files: Tuple[CatalogFile, ...] = tuple(files)
+        self._buildIndexes()
+
+    def __getstate__(self) -> dict:
+        # индексы (mappingproxy) не сериализуются, после загрузки строятся заново по списку файлов
+        return {'_RootPath': self._RootPath, '_Files': self._Files}
+
+    def __setstate__(self, state: dict):
+        self._RootPath = state['_RootPath']
+        self._Files = tuple(state['_Files'])
+        self._buildIndexes()
+
+    def _buildIndexes(self):
+        by_extension: Dict[str, List[CatalogFile]] = {}
+        by_top_directory: Dict[str, List[CatalogFile]] = {}
+        for catalog_file in self._Files:
+            by_extension.setdefault(catalog_file.extension, []).append(catalog_file)
+            by_top_directory.setdefault(catalog_file.top_directory, []).append(catalog_file)
+
+        self._ByExtension = MappingProxyType({key: tuple(value) for key, value in by_extension.items()})
+        self._ByTopDirectory = MappingProxyType({key: tuple(value) for key, value in by_top_directory.items()})
+
+    @classmethod
+    def scan(cls, root_path: str) -> 'PackageFileCatalog':
+        """
+        Обойду каталог пакета через os.scandir (в том же порядке, что и os.walk) и соберу каталог файлов
+        :param root_path: путь к пакету
+        """
+        files: List[CatalogFile] = []
+        # стек (путь к папке, папка верхнего уровня)
+        directories: List[Tuple[str, str]] = [(root_path, '')]
+
+        while directories:
+            directory, top_directory = directories.pop()
+            sub_directories: List[Tuple[str, str]] = []
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        try:
+                            is_dir = entry.is_dir()
+                        except OSError:
+                            is_dir = False
+
+                        if is_dir:
+                            if entry.name not in cls.SKIPPED_DIRECTORIES and not entry.is_symlink():
+                                sub_directories.append((entry.path, top_directory or entry.name))
+                        else:
+                            files.append(CatalogFile(entry.name, directory, entry.path,
+                                                     entry.name.split('.')[-1].lower(), top_directory))
+            except OSError:
+                continue
+
+            directories.extend(reversed(sub_directories))
+
+        return cls(root_path, files)
+
+    @property
+    def RootPath(self) -> str:
+        return self._RootPath
+
+    @property
+    def Files(self) -> Tuple[CatalogFile, ...]:
+        return self._Files
+
+    def getFiles(self, extension: Optional[str] = None, under: Optional[str] = None,
+                 exclude_top_directories: Tuple[str, ...] = ()) -> List[CatalogFile]:
+        """
+        Верну файлы каталога по фильтрам (в порядке обхода)
+        :param extension: расширение без точки, например 'sql' (по умолчанию любое)
+        :param under: папка относительно корня пакета, например 'release/cut2' (по умолчанию весь пакет)
+        :param exclude_top_directories: папки верхнего уровня, файлы из которых не нужны, например ('backup',)
+        """
+        if under:
+            under_parts = os.path.normpath(under).split(os.sep)
+            files = self._ByTopDirectory.get(under_parts[0], ())
+            if len(under_parts) > 1:
+                under_path = os.path.join(self._RootPath, *under_parts)
+                files = [catalog_file for catalog_file in files if catalog_file.directory == under_path or
+                         catalog_file.directory.startswith(under_path + os.sep)]
+        elif extension is not None:
+            files = self._ByExtension.get(extension.lower(), ())
+        else:
+            files = self._Files
+
+        return [catalog_file for catalog_file in files
+                if (extension is None or catalog_file.extension == extension.lower()) and
+                catalog_file.top_directory not in exclude_top_directories]
+
+
+# (имя, расположение, путь, флаги, тип) метаобъекта из config.hat
+MetaEntry = Tuple[str, str, str, str, str]
+# (размер, время изменения в наносекундах, sha1 содержимого)
+FileFingerprint = Tuple[int, int, str]
+
+
+class PackageParseManifest:
+    """
+    Манифест разбора пакета: объекты файлов пакета по пути и метаобъекты, разобранные из файлов метаданных,
+    вместе с отпечатками этих файлов. Хранится рядом с рабочим каталогом пакета и позволяет при повторном разборе
+    того же пакета не создавать заново объекты неизменившихся файлов и не перечитывать неизменившиеся config.hat.
+    Отпечаток файла метаданных всегда включает хэш содержимого, поэтому измененный файл не будет взят из манифеста,
+    даже если у него сохранились размер и время изменения
+    """
+    VERSION = 2
+
+    def __init__(self, manifest_path: str):
+        self._ManifestPath = manifest_path
+        # путь к файлу метаданных -> (отпечаток, метаобъекты)
+        self._Configs: Dict[str, Tuple[FileFingerprint, List[Any]]] = {}
+        # путь к файлу -> объект файла
+        self._FileObjects: Dict[str, Any] = {}
+
+    @property
+    def ManifestPath(self) -> str:
+        return self._ManifestPath
+
+    @staticmethod
+    def fingerprint(path: str) -> FileFingerprint:
+        """
+        Сниму отпечаток файла: размер, время изменения и хэш содержимого
+        """
+        stat = os.stat(path)
+        with open(path, 'rb') as f_in:
+            content_hash = hashlib.sha1(f_in.read()).hexdigest()
+
+        return stat.st_size, stat.st_mtime_ns, content_hash
+
+    def load(self) -> bool:
+        """
+        Прочитаю манифест с диска. Если манифеста нет, он битый или другой версии - начну с пустого
+        :return: удалось ли прочитать манифест
+        """
+        try:
+            with open(self._ManifestPath, 'rb') as f_in:
+                data = pickle.load(f_in)
+        except Exception:
+            # битый pickle может поднять почти любое исключение (ValueError, KeyError, IndexError, ...)
+            return False
+
+        if not isinstance(data, dict) or data.get('version') != self.VERSION:
+            return False
+
+        self._Configs = data.get('configs', {})
+        self._FileObjects = data.get('file_objects', {})
+        return True
+
+    def save(self):
+        """
+        Сохраню манифест на диск через уникальный временный файл в той же папке: манифест не останется
+        обрезанным, а воркеры xdist, разбирающие тот же пакет, не пишут в один и тот же временный файл
+        """
+        data = {'version': self.VERSION, 'configs': self._Configs, 'file_objects': self._FileObjects}
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(self._ManifestPath) + '.',
+                                            suffix='.tmp', dir=os.path.dirname(self._ManifestPath) or None)
+            with os.fdopen(fd, 'wb') as f_out:
+                pickle.dump(data, f_out, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._ManifestPath)
+        except (OSError, pickle.PicklingError) as e:
+            print('LOG: Cant save package parse manifest "{0}": {1}'.format(self._ManifestPath, e))
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+    def setFiles(self, files: Iterable[str]):
+        """
+        Запомню список файлов пакета: объекты и метаобъекты пропавших файлов больше не храню
+        """
+        files_set = set(files)
+        self._FileObjects = {path: saved for path, saved in self._FileObjects.items() if path in files_set}
+        self._Configs = {path: saved for path, saved in self._Configs.items() if path in files_set}
+
+    def getFileObject(self, path: str) -> Optional[Any]:
+        """
+        Верну объект файла, созданный при прошлом разборе. Объект файла строится только по пути,
+        поэтому для того же пути он не меняется
+        """
+        return self._FileObjects.get(path)
+
+    def setFileObject(self, path: str, file_object: Any):
+        self._FileObjects[path] = file_object
+
+    def getMetaObjects(self, path: str, fingerprint: FileFingerprint) -> Optional[List[Any]]:
+        """
+        Верну метаобъекты, разобранные из файла при прошлом разборе, если файл с тех пор не менялся
+        """
+        saved = self._Configs.get(path)
+        if saved is not None and saved[0] == fingerprint:
+            return saved[1]
+        return None
+
+    def setMetaObjects(self, path: str, fingerprint: FileFingerprint, meta_objects: List[Any]):
+        self._Configs[path] = (fingerprint, list(meta_objects))
@@ -0,0 +1,39 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class VialObjectIndex:
+    """
+    Индекс vial-объектов пакета одной стадии (ответ ChimeraApi.get_vial_objects).
+    Объекты индексированы по имени и по значениям extra_params (там лежат имена физики),
+    порядок объектов из ответа Chimera сохраняется
+    """
+
+    def __init__(self, vial_objects: Dict[str, Any]):
+        self._items: Tuple[Dict[str, Any], ...] = tuple(vial_objects.get('items') or ())
+        self._by_name: Dict[str, List[int]] = {}
+        self._by_extra_value: Dict[str, List[int]] = {}
+
+        for position, item in enumerate(self._items):
+            self._by_name.setdefault(item.get('name'), []).append(position)
+            for param in item.get('extra_params') or ():
+                self._by_extra_value.setdefault(param.get('value'), []).append(position)
+
+    @property
+    def items(self) -> Tuple[Dict[str, Any], ...]:
+        return self._items
+
+    def find_first(self, *names: str) -> Optional[Dict[str, Any]]:
+        """
+        Верну первый по порядку объект, имя которого совпадает с одним из переданных
+        """
+        positions = [self._by_name[name][0] for name in names if name in self._by_name]
+        return self._items[min(positions)] if positions else None
+
+    def find_last(self, name: str, phys_name: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Верну последний по порядку объект с переданным именем или с phys_name среди значений extra_params
+        """
+        positions = self._by_name.get(name, [])[-1:]
+        if phys_name is not None:
+            positions += self._by_extra_value.get(phys_name, [])[-1:]
+        return self._items[max(positions)] if positions else None
@@ -1,22 +1,61 @@
 import pytest
 import os
 from typing import List
-from Framework.utils import pickle_package_helper
 from Framework.ETLobjects.PackageModels import SASpackage
 from Framework.ETLobjects.job import JobDetail
 from Framework.ETLobjects.table import TableFactory, get_prefix, TableDetail
 
 
+# ключ workerinput, в котором воркер xdist получает путь к снимку разобранного пакета
+PACKAGE_SNAPSHOT_INPUT = 'package_snapshot'
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_configure_node(node):
+    """
+    Процесс сбора один раз сохраняет снимок разобранного пакета и передает путь к нему каждому воркеру xdist
+    """
+    config = node.config
+    pack = config.option.pack
+    if not isinstance(pack, SASpackage):
+        return
+
+    snapshot_path = getattr(config, '_package_snapshot_path', None)
+    if snapshot_path is None:
+        snapshot_path = os.path.join(config.option.temp_path, '{0}.snapshot'.format(config.option.task))
+        try:
+            pack.dump_snapshot(snapshot_path)
+        except Exception as e:
+            # без снимка воркеры разберут пакет сами, как раньше
+            print('LOG: Cant save package snapshot "{0}", workers will parse the package: {1}'.format(
+                snapshot_path, e))
+            snapshot_path = ''
+        config._package_snapshot_path = snapshot_path
+
+    if snapshot_path:
+        node.workerinput[PACKAGE_SNAPSHOT_INPUT] = snapshot_path
+
+
 @pytest.fixture(scope='session', autouse=True)
 def package(request) -> SASpackage:
 
-    pack = request.config.option.pack
+    pack = None
+    snapshot_path = getattr(request.config, 'workerinput', {}).get(PACKAGE_SNAPSHOT_INPUT)
+    if snapshot_path:
+        # воркер xdist: пакет не разбираем заново, а загружаем из снимка процесса сбора
+        try:
+            pack = SASpackage.load_snapshot(snapshot_path)
+        except Exception as e:
+            print('LOG: Cant load package snapshot "{0}", the package parsed by the worker is used: {1}'.format(
+                snapshot_path, e))
+    if pack is None:
+        pack = request.config.option.pack
 
     def package_teardown():
-        pass
+        if isinstance(pack, SASpackage):
+            pack.close()
 
     request.addfinalizer(package_teardown)
-    # return pickle_package_helper.load(os.path.join(request.config.option.temp_path, request.config.option.task))
     return pack
 
 
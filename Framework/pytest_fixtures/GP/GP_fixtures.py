@@ -1,32 +1,55 @@
 import pytest
-from Config import enviroment, user
-from Config.special_configs import GlobalConfig
 from common.postgresql import GreenPlumSQL
+from Framework.utils.gp_connection_pool import GreenPlumConnectionPool, ACQUIRE_TIMEOUT, \
+    get_gp_fixtures_pool, get_gp_prod_fixtures_pool, close_connection_pools
+
+
+@pytest.hookimpl(trylast=True)
+def pytest_sessionfinish(session, exitstatus):
+    # после всех тестов закрываю свободные подключения всех пулов процесса (и фикстур, и анализатора пакета)
+    close_connection_pools()
+
+
+@pytest.fixture(scope='session')
+def GP_connection_pool(request) -> GreenPlumConnectionPool:
+    pool = get_gp_fixtures_pool()
+
+    def GP_connection_pool_teardown():
+        pool.close_all()
+    request.addfinalizer(GP_connection_pool_teardown)
+
+    return pool
+
+
+@pytest.fixture(scope='session')
+def GP_prod_connection_pool(request) -> GreenPlumConnectionPool:
+    pool = get_gp_prod_fixtures_pool()
+
+    def GP_prod_connection_pool_teardown():
+        pool.close_all()
+    request.addfinalizer(GP_prod_connection_pool_teardown)
+
+    return pool
 
 
 @pytest.fixture()
-def GP_integration(request) -> GreenPlumSQL:
-    gp_api = GreenPlumSQL(enviroment.local['gp']['Host'],
-                          enviroment.local['gp']['Port'],
-                          enviroment.local['gp']['DbName'], user.GPLogin, user.GPPassword)
+def GP_integration(request, GP_connection_pool) -> GreenPlumSQL:
+    gp_api = GP_connection_pool.acquire(timeout=ACQUIRE_TIMEOUT)
 
     def GP_integration_teardown():
-        pass
+        # состояние теста (транзакция, временные таблицы, SET) не должно попасть в следующий тест
+        GP_connection_pool.release(gp_api, broken=not GP_connection_pool.reset(gp_api))
     request.addfinalizer(GP_integration_teardown)
 
     return gp_api
 
 
 @pytest.fixture()
-def GP_prod_integration(request) -> GreenPlumSQL:
-    g_conf = GlobalConfig()
-    gp_prod_conn = GreenPlumSQL(enviroment.local['gp_prod']['Host'], enviroment.local['gp_prod']['Port'],
-                                enviroment.local['gp_prod']['DbName'],
-                                g_conf.gp_prod_user,
-                                g_conf.gp_prod_password)
+def GP_prod_integration(request, GP_prod_connection_pool) -> GreenPlumSQL:
+    gp_prod_conn = GP_prod_connection_pool.acquire(timeout=ACQUIRE_TIMEOUT)
 
     def GP_prod_integration_teardown():
-        pass
+        GP_prod_connection_pool.release(gp_prod_conn, broken=not GP_prod_connection_pool.reset(gp_prod_conn))
     request.addfinalizer(GP_prod_integration_teardown)
 
     return gp_prod_conn
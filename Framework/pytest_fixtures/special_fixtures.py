@@ -604,17 +604,12 @@ def core_resolver_client(request):
 
 
 @pytest.fixture(scope='session')
-def released_packages_from_sdp(GP_integration):
+def released_packages_from_sdp(GP_connection_pool):
     from Framework.utils.package_utils import PackageUtils
-    from Config import enviroment, user
-    from common.postgresql import GreenPlumSQL
+    from Framework.utils.gp_connection_pool import ACQUIRE_TIMEOUT
 
-    gp_connect = GreenPlumSQL(enviroment.local['gp']['Host'],
-                          enviroment.local['gp']['Port'],
-                          enviroment.local['gp']['DbName'], user.GPLogin, user.GPPassword)
-
-    released_packages = PackageUtils.get_released_packages_from_sdp(gp_connect)
-    gp_connect.close()
+    with GP_connection_pool.lease(timeout=ACQUIRE_TIMEOUT) as gp_connect:
+        released_packages = PackageUtils.get_released_packages_from_sdp(gp_connect)
     return released_packages
 
 
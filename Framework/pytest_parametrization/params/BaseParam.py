@@ -4,6 +4,7 @@ from abc import ABC, abstractmethod
 from typing import Optional, List, Union, Any, Tuple, Callable
 
 from Framework.utils.Gitlab_etl_worker import GitlabMetaRepoFactory
+from Framework.ETLobjects.dag import load_tedi_dags
 
 
 class Params:
@@ -134,13 +135,18 @@ class BaseParametrsBuild(ABC):
 
         ids: List[str] = []
         params: List[Tuple[str, str]] = []
+        # фабрику получаем один раз в основном потоке: она настраивает контур TediDag
+        tedi_dag_factory = self.package_analyzer.tedi_dag_factory
+        branch = self.package_analyzer.name
+        loaded_dags = load_tedi_dags(dags, lambda dag_name, **settings: tedi_dag_factory(dag_name, branch=branch, **settings),
+                                     action=lambda tedi_dag: tedi_dag.get_target_tables())
         for dag in dags:
-            tech_dag = self.package_analyzer.tedi_dag_factory(dag, branch=self.package_analyzer.name)
-            list_of_targets = []
-            try:
-                list_of_targets = tech_dag.get_target_tables()
-            except Exception as e:
-                pass
+            loaded_dag = loaded_dags[dag]
+            if loaded_dag.dag is None:
+                raise loaded_dag.error
+            tech_dag = loaded_dag.dag
+            # ошибки получения таргетов не прерывают параметризацию
+            list_of_targets = loaded_dag.value if loaded_dag.error is None else []
 
             for target in list_of_targets:
                 params.append((tech_dag.name, target))
@@ -154,13 +160,18 @@ class BaseParametrsBuild(ABC):
 
         ids: List[str] = []
         params: List[Tuple[str, str]] = []
+        # фабрику получаем один раз в основном потоке: она настраивает контур TediDag
+        tedi_dag_factory = self.package_analyzer.tedi_dag_factory
+        branch = self.package_analyzer.name
+        loaded_dags = load_tedi_dags(dags, lambda dag_name, **settings: tedi_dag_factory(dag_name, branch=branch, **settings),
+                                     action=lambda tedi_dag: tedi_dag.get_dlh_targets())
         for dag in dags:
-            tech_dag = self.package_analyzer.tedi_dag_factory(dag, branch=self.package_analyzer.name)
-            list_of_targets = []
-            try:
-                list_of_targets = tech_dag.get_dlh_targets()
-            except Exception as e:
-                pass
+            loaded_dag = loaded_dags[dag]
+            if loaded_dag.dag is None:
+                raise loaded_dag.error
+            tech_dag = loaded_dag.dag
+            # ошибки получения таргетов не прерывают параметризацию
+            list_of_targets = loaded_dag.value if loaded_dag.error is None else []
 
             for target in list_of_targets:
                 params.append((tech_dag.name, target))
@@ -229,7 +240,12 @@ class BaseParametrsBuild(ABC):
                 target_old_name = self.package_analyzer.get_name_of_table_before_renaming(target, 'GpTable')
                 if target_old_name:
                     targets_with_old_names[target] = target_old_name
-                    targets_with_depend_dags[target] = self.package_analyzer.get_dags_depend_on_table(target_old_name)
+
+        # зависимые даги всех таргетов ищем одним запросом
+        depend_dags = self.package_analyzer.get_dags_depend_on_tables(
+            [(target_old_name, 'gp') for target_old_name in targets_with_old_names.values()]) or {}
+        for target, target_old_name in targets_with_old_names.items():
+            targets_with_depend_dags[target] = depend_dags.get((target_old_name, 'gp'), [])
 
         params = []
         ids = []
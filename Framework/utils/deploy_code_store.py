@@ -0,0 +1,69 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable
+
+
+class DeployCodeStore:
+    """
+    Хранилище кода деплоя джобов.
+    Код запрашивается параллельно (не больше max_workers запросов одновременно) и хранится в памяти.
+    Ошибки получения кода не кэшируются: при следующем запросе джоб запрашивается заново,
+    последняя ошибка по джобу доступна в errors
+    """
+    DEFAULT_WORKERS = 8
+
+    def __init__(self, fetcher: Callable[[str], str], max_workers: int = DEFAULT_WORKERS):
+        """
+        :param fetcher: функция, возвращающая код деплоя по имени джоба
+        :param max_workers: максимальное количество одновременных запросов кода
+        """
+        self._fetcher = fetcher
+        self._max_workers = max_workers
+        self._codes: Dict[str, str] = {}
+        self._errors: Dict[str, Exception] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def errors(self) -> Dict[str, Exception]:
+        """Последние ошибки получения кода по джобам, которые так и не удалось получить"""
+        return dict(self._errors)
+
+    def _load(self, job: str):
+        try:
+            code = self._fetcher(job)
+        except Exception as e:
+            with self._lock:
+                self._errors[job] = e
+            return
+
+        with self._lock:
+            self._codes[job] = code
+            self._errors.pop(job, None)
+
+    def fetch(self, jobs: Iterable[str]) -> Dict[str, str]:
+        """
+        Параллельно получу код деплоя джобов, которых еще нет в хранилище.
+        Джобы, которые не удалось получить раньше, запрашиваются заново (один раз за вызов)
+        :param jobs: имена джобов
+        :return: код деплоя успешно полученных джобов
+        """
+        jobs = list(dict.fromkeys(jobs))
+        with self._lock:
+            not_loaded = [job for job in jobs if job not in self._codes]
+
+        if not_loaded:
+            with ThreadPoolExecutor(max_workers=min(self._max_workers, len(not_loaded))) as executor:
+                list(executor.map(self._load, not_loaded))
+
+        with self._lock:
+            return {job: self._codes[job] for job in jobs if job in self._codes}
+
+    def get(self, job: str) -> str:
+        """
+        Верну код деплоя джоба. Если получить код не удалось - подниму ошибку, с которой упал запрос
+        """
+        self.fetch([job])
+        with self._lock:
+            if job in self._codes:
+                return self._codes[job]
+            raise self._errors[job]
@@ -0,0 +1,379 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Dict, List, Tuple, Optional
+
+if TYPE_CHECKING:
+    from common.postgresql import GreenPlumSQL
+
+# сколько подключений к одному контуру GP держит каждый пул за весь прогон
+# (при запуске через xdist делится между воркерами)
+GP_CONNECTIONS_LIMIT = 8
+
+# сколько секунд по умолчанию ждем свободное подключение пула
+ACQUIRE_TIMEOUT = 300.0
+
+
+class GreenPlumConnectionPool:
+    """
+    Ограниченный пул подключений к GreenPlum.
+    Подключения создаются по требованию (не больше max_size одновременно), после возврата в пул переиспользуются.
+    Подключение, простоявшее без дела дольше health_check_interval секунд, перед выдачей проверяется запросом
+    HEALTH_CHECK_QUERY, упавшее подключение заменяется новым.
+    Закрепленная сессия (acquire с pinned=True, так берут подключение LazyGreenPlumConnection) добавляет пулу
+    место на время, пока она выдана: анализаторов пакета в процессе может быть несколько, и каждый держит
+    свою сессию, не дожидаясь, пока другой ее отдаст
+    """
+    HEALTH_CHECK_QUERY = 'select 1'
+    # сброс сессии (DISCARD ALL нельзя выполнить внутри транзакции, а драйвер может открыть ее сам)
+    RESET_QUERIES = ('rollback', 'discard temp', 'reset all', 'commit')
+
+    def __init__(self, connection_factory: Callable[[], 'GreenPlumSQL'], max_size: int = 2,
+                 health_check_interval: float = 30.0):
+        """
+        :param connection_factory: функция, открывающая новое подключение
+        :param max_size: максимальное количество подключений пула
+        :param health_check_interval: через сколько секунд простоя подключение проверяется перед выдачей
+        """
+        if max_size < 1:
+            raise ValueError('Connection pool size must be positive, got {0}'.format(max_size))
+
+        self._connection_factory = connection_factory
+        self._max_size = max_size
+        self._health_check_interval = health_check_interval
+        # свободные подключения и время их возврата в пул
+        self._idle: List[Tuple['GreenPlumSQL', float]] = []
+        self._created = 0
+        # сколько закрепленных сессий сейчас выдано (каждая добавляет место в пуле)
+        self._pinned = 0
+        self._condition = threading.Condition()
+
+    @property
+    def max_size(self) -> int:
+        return self._max_size
+
+    @property
+    def size(self) -> int:
+        """Сколько подключений сейчас открыто (свободных и выданных)"""
+        return self._created
+
+    def is_alive(self, connection: 'GreenPlumSQL') -> bool:
+        """
+        Проверю подключение запросом HEALTH_CHECK_QUERY
+        """
+        try:
+            connection.executeAndReturnLists(self.HEALTH_CHECK_QUERY)
+            return True
+        except Exception as e:
+            print('LOG: GreenPlum connection failed health check, it will be reopened: {0}'.format(e))
+            return False
+
+    def reset(self, connection: 'GreenPlumSQL') -> bool:
+        """
+        Сброшу состояние сессии перед возвратом в пул: откачу транзакцию, удалю временные таблицы
+        и верну параметры SET к значениям по умолчанию
+        :return: жива ли сессия после сброса
+        """
+        for query in self.RESET_QUERIES:
+            try:
+                connection.executeAndReturnLists(query)
+            except Exception:
+                # команды не возвращают строк, драйвер может поднять ошибку на чтении результата
+                pass
+        return self.is_alive(connection)
+
+    @staticmethod
+    def _close(connection: 'GreenPlumSQL'):
+        close = getattr(connection, 'close', None)
+        if callable(close):
+            try:
+                close()
+            except Exception:
+                pass
+
+    def _get_limit(self) -> int:
+        return self._max_size + self._pinned
+
+    def acquire(self, timeout: Optional[float] = ACQUIRE_TIMEOUT, pinned: bool = False) -> 'GreenPlumSQL':
+        """
+        Возьму подключение из пула. Если свободных нет и лимит исчерпан - жду, пока подключение вернут,
+        и поднимаю TimeoutError, если не дождался
+        :param timeout: сколько секунд ждать свободное подключение (None - без ограничения)
+        :param pinned: подключение берется как закрепленная сессия (на нее в пуле добавляется место)
+        :return: подключение, его обязательно нужно вернуть через release (с тем же pinned)
+        """
+        if pinned:
+            with self._condition:
+                self._pinned += 1
+        try:
+            return self._acquire(timeout)
+        except BaseException:
+            if pinned:
+                self._unpin()
+            raise
+
+    def _acquire(self, timeout: Optional[float]) -> 'GreenPlumSQL':
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            with self._condition:
+                while not self._idle and self._created >= self._get_limit():
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError('No free GreenPlum connection in pool after {0} seconds'.format(timeout))
+                    self._condition.wait(remaining)
+
+                if self._idle:
+                    connection, released_at = self._idle.pop()
+                else:
+                    connection, released_at = None, None
+                    self._created += 1
+
+            if connection is None:
+                try:
+                    return self._connection_factory()
+                except Exception:
+                    self._discard()
+                    raise
+
+            if time.monotonic() - released_at < self._health_check_interval or self.is_alive(connection):
+                return connection
+
+            # подключение упало - закрываю и беру следующее (или открываю новое)
+            self._close(connection)
+            self._discard()
+
+    def release(self, connection: 'GreenPlumSQL', broken: bool = False, pinned: bool = False):
+        """
+        Верну подключение в пул
+        :param connection: подключение, полученное через acquire
+        :param broken: подключение неисправно - закрыть его, а не отдавать дальше
+        :param pinned: подключение было взято как закрепленная сессия
+        """
+        with self._condition:
+            if pinned:
+                self._pinned -= 1
+            # место закрепленной сессии освободилось - лишнее подключение закрываю, а не держу свободным
+            if not broken and self._created > self._get_limit():
+                broken = True
+            if not broken:
+                self._idle.append((connection, time.monotonic()))
+                self._condition.notify()
+                return
+
+        self._close(connection)
+        self._discard()
+
+    def _unpin(self):
+        with self._condition:
+            self._pinned -= 1
+
+    def _discard(self):
+        with self._condition:
+            self._created -= 1
+            self._condition.notify()
+
+    @contextmanager
+    def lease(self, timeout: Optional[float] = ACQUIRE_TIMEOUT):
+        """
+        Возьму подключение из пула на время блока with. Если в блоке упал запрос и подключение
+        не проходит проверку - закрою его, а не верну в пул
+        """
+        connection = self.acquire(timeout)
+        try:
+            yield connection
+        except Exception:
+            self.release(connection, broken=not self.is_alive(connection))
+            raise
+        self.release(connection)
+
+    def close_all(self):
+        """
+        Закрою свободные подключения пула (выданные закроются при возврате, если вернуть их с broken=True)
+        """
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+            self._condition.notify_all()
+
+        for connection, _ in idle:
+            self._close(connection)
+
+
+class LazyGreenPlumConnection:
+    """
+    Подключение к GreenPlum из пула, которое открывается при первом вызове метода и дальше держится
+    как одна сессия до release(): временные таблицы, SET и транзакции работают между вызовами так же,
+    как с GreenPlumSQL. Сессия берется из пула как закрепленная и не занимает место других подключений пула,
+    поэтому несколько пакетов в одном процессе не ждут друг друга. Вызовы из разных потоков выполняются
+    в этой сессии по очереди.
+    Если вызов упал и сессия не проходит проверку, она закрывается, следующий вызов откроет новую
+    """
+
+    def __init__(self, pool: GreenPlumConnectionPool, timeout: Optional[float] = ACQUIRE_TIMEOUT):
+        """
+        :param pool: пул, из которого берется сессия
+        :param timeout: сколько секунд ждать свободное подключение пула
+        """
+        self._pool = pool
+        self._timeout = timeout
+        self._connection: Optional['GreenPlumSQL'] = None
+        self._lock = threading.RLock()
+
+    @property
+    def pool(self) -> GreenPlumConnectionPool:
+        return self._pool
+
+    @property
+    def connected(self) -> bool:
+        """Держит ли сейчас сессию из пула"""
+        return self._connection is not None
+
+    def connect(self) -> bool:
+        """
+        Явно открою сессию (если она еще не открыта)
+        :return: удалось ли подключиться
+        """
+        try:
+            with self._lock:
+                self._get_connection()
+            return True
+        except Exception as e:
+            print('LOG: Cant connect to GreenPlum: {0}'.format(e))
+            return False
+
+    def release(self):
+        """
+        Верну сессию в пул, следующий вызов метода откроет ее заново
+        """
+        with self._lock:
+            connection, self._connection = self._connection, None
+        if connection is not None:
+            self._pool.release(connection, pinned=True)
+
+    def _get_connection(self) -> 'GreenPlumSQL':
+        if self._connection is None:
+            self._connection = self._pool.acquire(self._timeout, pinned=True)
+        return self._connection
+
+    def _call(self, item: str, *args, **kwargs):
+        with self._lock:
+            connection = self._get_connection()
+            try:
+                return getattr(connection, item)(*args, **kwargs)
+            except Exception:
+                if not self._pool.is_alive(connection):
+                    self._connection = None
+                    self._pool.release(connection, broken=True, pinned=True)
+                raise
+
+    def __getattr__(self, item):
+        # сюда попадаем только за атрибутами GreenPlumSQL (собственные атрибуты находятся обычным путем).
+        # Пока сессия не открыта, атрибут считаем методом: подключение откроется при его вызове
+        if item.startswith('__'):
+            raise AttributeError(item)
+
+        connection = self._connection
+        if connection is not None:
+            attribute = getattr(connection, item)
+            if not callable(attribute):
+                return attribute
+
+        def session_call(*args, **kwargs):
+            return self._call(item, *args, **kwargs)
+
+        return session_call
+
+
+_pools: Dict[str, GreenPlumConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_connection_pool(name: str, connection_factory: Callable[[], 'GreenPlumSQL'],
+                        max_size: int = 2) -> GreenPlumConnectionPool:
+    """
+    Верну общий для процесса пул подключений с именем name, при первом обращении создам его
+    :param name: имя пула, например 'gp' или 'gp_prod'
+    :param connection_factory: функция, открывающая новое подключение
+    :param max_size: максимальное количество подключений пула (учитывается только при создании)
+    """
+    with _pools_lock:
+        pool = _pools.get(name)
+        if pool is None:
+            pool = GreenPlumConnectionPool(connection_factory, max_size)
+            _pools[name] = pool
+        return pool
+
+
+def get_worker_pool_size(connections_limit: int = GP_CONNECTIONS_LIMIT) -> int:
+    """
+    Верну лимит подключений пула для текущего процесса: при запуске через pytest-xdist общий лимит
+    делится поровну между воркерами, чтобы параллельный прогон не упирался в max_connections кластера
+    """
+    workers_count = int(os.environ.get('PYTEST_XDIST_WORKER_COUNT') or 1)
+    return max(1, connections_limit // workers_count)
+
+
+def open_gp_connection() -> 'GreenPlumSQL':
+    from Config import enviroment, user
+    from common.postgresql import GreenPlumSQL
+
+    return GreenPlumSQL(enviroment.local['gp']['Host'],
+                        enviroment.local['gp']['Port'],
+                        enviroment.local['gp']['DbName'], user.GPLogin,
+                        user.GPPassword)
+
+
+def open_gp_prod_connection() -> 'GreenPlumSQL':
+    from Config import enviroment
+    from Config.special_configs import GlobalConfig
+    from common.postgresql import GreenPlumSQL
+
+    g_conf = GlobalConfig()
+    return GreenPlumSQL(enviroment.local['gp_prod']['Host'],
+                        enviroment.local['gp_prod']['Port'],
+                        enviroment.local['gp_prod']['DbName'],
+                        g_conf.gp_prod_user,
+                        g_conf.gp_prod_password)
+
+
+def get_gp_pool() -> GreenPlumConnectionPool:
+    """
+    Верну общий пул подключений к тестовому контуру GP
+    """
+    return get_connection_pool('gp', open_gp_connection, get_worker_pool_size())
+
+
+def get_gp_prod_pool() -> GreenPlumConnectionPool:
+    """
+    Верну общий пул подключений к проду GP
+    """
+    return get_connection_pool('gp_prod', open_gp_prod_connection, get_worker_pool_size())
+
+
+def get_gp_fixtures_pool() -> GreenPlumConnectionPool:
+    """
+    Верну пул подключений к тестовому контуру GP для фикстур. Он отделен от пула анализатора пакета:
+    фикстура держит подключение весь тест, и тест, который при этом обращается к пакету,
+    не должен ждать сам себя
+    """
+    return get_connection_pool('gp_fixtures', open_gp_connection, get_worker_pool_size())
+
+
+def get_gp_prod_fixtures_pool() -> GreenPlumConnectionPool:
+    """
+    Верну пул подключений к проду GP для фикстур (отдельный от пула анализатора пакета)
+    """
+    return get_connection_pool('gp_prod_fixtures', open_gp_prod_connection, get_worker_pool_size())
+
+
+def close_connection_pools():
+    """
+    Закрою свободные подключения всех пулов процесса
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+
+    for pool in pools:
+        pool.close_all()
@@ -0,0 +1,146 @@
+import threading
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Hashable, NamedTuple, Optional
+
+# атрибут экземпляра, в котором лежат кэши всех его методов
+CACHES_ATTRIBUTE = '_method_caches'
+
+# признак отсутствия значения в кэше (None и пустые коллекции - тоже результат, их кэшируем)
+_MISSING = object()
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: Optional[int]
+    currsize: int
+
+
+class MethodCache:
+    """
+    Кэш результатов одного метода одного экземпляра: LRU с ограничением размера и счетчиками попаданий/промахов.
+    Сериализуется вместе с экземпляром (блокировка при этом пересоздается)
+    """
+
+    def __init__(self, maxsize: Optional[int] = None):
+        self._maxsize = maxsize
+        self._values: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.RLock()
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            value = self._values.get(key, _MISSING)
+            if value is _MISSING:
+                self._misses += 1
+            else:
+                self._hits += 1
+                self._values.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._values[key] = value
+            self._values.move_to_end(key)
+            if self._maxsize is not None and len(self._values) > self._maxsize:
+                self._values.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> bool:
+        with self._lock:
+            return self._values.pop(key, _MISSING) is not _MISSING
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self._maxsize, len(self._values))
+
+
+def _default_key(*args, **kwargs) -> Hashable:
+    return args + tuple(sorted(kwargs.items())) if kwargs else args
+
+
+def _get_method_cache(instance, method_name: str, maxsize: Optional[int] = None,
+                      create: bool = True) -> Optional[MethodCache]:
+    caches: Dict[str, MethodCache] = instance.__dict__.get(CACHES_ATTRIBUTE)
+    if caches is None:
+        if not create:
+            return None
+        caches = instance.__dict__.setdefault(CACHES_ATTRIBUTE, {})
+
+    cache = caches.get(method_name)
+    if cache is None and create:
+        cache = caches.setdefault(method_name, MethodCache(maxsize))
+    return cache
+
+
+def cached_method(maxsize: Optional[int] = None, key: Optional[Callable[..., Hashable]] = None):
+    """
+    Закэширую результаты метода в экземпляре. Кэшируется любой результат, в том числе None и пустой,
+    исключения не кэшируются. Кэш хранится в __dict__ экземпляра и сериализуется вместе с ним
+    :param maxsize: максимальное количество хранимых результатов (по умолчанию без ограничения)
+    :param key: функция от аргументов метода (без self), возвращающая ключ кэша.
+        По умолчанию ключ - все аргументы метода
+    """
+    make_key = key if key is not None else _default_key
+
+    def decorator(method):
+        method_name = method.__name__
+
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            cache = _get_method_cache(self, method_name, maxsize)
+            cache_key = make_key(*args, **kwargs)
+
+            value = cache.get(cache_key)
+            if value is _MISSING:
+                value = method(self, *args, **kwargs)
+                cache.set(cache_key, value)
+            return value
+
+        return wrapper
+
+    return decorator
+
+
+def invalidate_cached(instance, method_name: str, cache_key: Hashable) -> bool:
+    """
+    Удалю из кэша метода результат с переданным ключом
+    :param instance: экземпляр, в котором хранится кэш
+    :param method_name: имя метода
+    :param cache_key: ключ кэша (результат функции key декоратора, по умолчанию - кортеж аргументов метода)
+    :return: был ли такой результат в кэше
+    """
+    cache = _get_method_cache(instance, method_name, create=False)
+    return cache.invalidate(cache_key) if cache is not None else False
+
+
+def clear_cached(instance, method_name: Optional[str] = None):
+    """
+    Очищу кэш метода, а если метод не передан - кэши всех методов экземпляра
+    """
+    caches: Dict[str, MethodCache] = instance.__dict__.get(CACHES_ATTRIBUTE, {})
+    for name, cache in caches.items():
+        if method_name is None or name == method_name:
+            cache.clear()
+
+
+def cache_info(instance, method_name: str) -> CacheInfo:
+    """
+    Верну статистику кэша метода: попадания, промахи, ограничение и текущий размер
+    """
+    cache = _get_method_cache(instance, method_name, create=False)
+    return cache.info() if cache is not None else CacheInfo(0, 0, None, 0)
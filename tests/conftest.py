@@ -0,0 +1,111 @@
+import importlib
+import importlib.abc
+import importlib.machinery
+import sys
+import types
+
+import pytest
+
+# корни внешних модулей (клиенты GP/Consul/Chimera/GitLab, конфиги стенда), которых может не быть в окружении тестов
+STUBBED_ROOTS = ('Config', 'common', 'dwh_metadata_extractor', 'gitlab', 'pytz', 'dateutil', 'Framework', 'helpers')
+# декораторы, которые в заглушке ничего не делают
+STUBBED_DECORATORS = ('catch_problem', 'execution_timer')
+
+
+class FakePackageObject:
+    """
+    Объект пакета с тем же конструктором и атрибутами, что и Framework.ETLobjects.package_object.PackageObject
+    """
+
+    def __init__(self, name, location, path, flags='', type='', metaobject=False, phys_table=None,
+                 new_meta_object=None):
+        self.Name = name
+        self.Location = location
+        self.Path = path
+        self.Flags = flags
+        self.Type = type
+        self.MetaObject = metaobject
+        self.PhysTable = phys_table
+        self.NewMetaObject = new_meta_object
+        self.OldMetaObject = None
+
+
+class FakePackageObjectsList:
+    def __init__(self):
+        self._Objects = []
+
+    def addObject(self, package_object):
+        self._Objects.append(package_object)
+
+    def getObjects(self):
+        return list(self._Objects)
+
+    def getFileObjects(self):
+        return [package_object for package_object in self._Objects if not package_object.MetaObject]
+
+    def getObject(self, name):
+        for package_object in self._Objects:
+            if package_object.Name == name:
+                return package_object
+        return None
+
+    def getCountObjects(self):
+        return len(self._Objects)
+
+
+class StubModule(types.ModuleType):
+    """
+    Заглушка отсутствующего модуля: имена с большой буквы - пустые классы (годятся и как исключения),
+    с маленькой - вложенные заглушки
+    """
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        if name in STUBBED_DECORATORS:
+            value = lambda function: function
+        elif name[0].islower():
+            value = StubModule('{0}.{1}'.format(self.__name__, name))
+        else:
+            value = type(name, (Exception,), {'__module__': self.__name__})
+        setattr(self, name, value)
+        return value
+
+
+class StubFinder(importlib.abc.MetaPathFinder, importlib.abc.Loader):
+    """
+    Стоит последним в sys.meta_path: подставляет заглушку только для модуля, который не нашелся обычным импортом
+    """
+
+    def find_spec(self, fullname, path, target=None):
+        if fullname.split('.')[0] not in STUBBED_ROOTS:
+            return None
+        return importlib.machinery.ModuleSpec(fullname, self, is_package=True)
+
+    def create_module(self, spec):
+        module = StubModule(spec.name)
+        module.__path__ = []
+        if spec.name == 'Framework.ETLobjects.package_object':
+            module.PackageObject = FakePackageObject
+            module.PackageObjectsList = FakePackageObjectsList
+        return module
+
+    def exec_module(self, module):
+        pass
+
+
+@pytest.fixture(scope='module')
+def import_with_stubs():
+    """
+    Импортирую модуль фреймворка, подставив заглушки вместо внешних зависимостей, которых нет в окружении.
+    Модули, загруженные при этом, после тестов модуля выгружаются
+    """
+    loaded_before = set(sys.modules)
+    finder = StubFinder()
+    sys.meta_path.append(finder)
+    try:
+        yield importlib.import_module
+    finally:
+        sys.meta_path.remove(finder)
+        for module_name in set(sys.modules) - loaded_before:
+            del sys.modules[module_name]
@@ -0,0 +1,69 @@
+import pickle
+
+import pytest
+
+from Framework.ETLobjects.backup_ddl import BackupDdlIndex
+
+BACKUP_DDL = '''header without separator
+-- DROP TABLE test_emart.client;
+-- CREATE TABLE test_emart.client (id int);
+-- DROP TABLE test_emart.deal;
+CREATE TABLE test_emart.deal (id int, amount numeric);
+-- comment about test_emart.rate;
+CREATE TABLE test_emart.rate (id int);
+'''
+
+
+@pytest.fixture
+def ddl_path(tmp_path):
+    path = tmp_path / 'backup_ddl.sql'
+    path.write_text(BACKUP_DDL, encoding='utf-8')
+    return str(path)
+
+
+def test_dropped_tables_and_table_ddl(ddl_path):
+    with BackupDdlIndex(ddl_path) as index:
+        assert index.get_dropped_tables() == ['test_emart.client', 'test_emart.deal']
+        assert index.get_table_ddl('test_emart.deal') == (
+            'DROP TABLE test_emart.deal;\nCREATE TABLE test_emart.deal (id int, amount numeric);\n')
+        # таблица без заголовка DROP TABLE ищется по '<таблица>;'
+        assert index.get_table_ddl('test_emart.rate').startswith('comment about test_emart.rate;')
+        assert index.get_table_ddl('test_emart.unknown') == ''
+
+
+def test_crlf_line_endings_are_normalized(tmp_path):
+    path = tmp_path / 'backup_ddl.sql'
+    path.write_bytes(BACKUP_DDL.replace('\n', '\r\n').encode('utf-8'))
+
+    index = BackupDdlIndex(str(path))
+    assert index.get_dropped_tables() == ['test_emart.client', 'test_emart.deal']
+    assert index.get_table_ddl('test_emart.client') == 'DROP TABLE test_emart.client;\n'
+    assert '\r' not in index.get_table_ddl('test_emart.rate')
+
+
+def test_file_is_not_kept_open(ddl_path, tmp_path):
+    index = BackupDdlIndex(ddl_path)
+    index.get_dropped_tables()
+
+    # файл прочитан один раз, дальше индекс работает без него
+    (tmp_path / 'backup_ddl.sql').unlink()
+    assert index.get_table_ddl('test_emart.client') == 'DROP TABLE test_emart.client;\n'
+
+
+def test_close_and_pickle_reload_file(ddl_path, tmp_path):
+    index = BackupDdlIndex(ddl_path)
+    index.get_dropped_tables()
+    restored = pickle.loads(pickle.dumps(index))
+
+    (tmp_path / 'backup_ddl.sql').write_text('-- DROP TABLE test_emart.other;\n', encoding='utf-8')
+    assert restored.get_table_ddl('test_emart.other') == 'DROP TABLE test_emart.other;\n'
+
+    index.close()
+    assert index.get_dropped_tables() == ['test_emart.other']
+
+
+def test_missing_file_is_empty(tmp_path):
+    index = BackupDdlIndex(str(tmp_path / 'missing.sql'))
+
+    assert index.get_dropped_tables() == []
+    assert index.get_table_ddl('test_emart.client') == ''
@@ -0,0 +1,40 @@
+import pytest
+
+from Framework.utils.deploy_code_store import DeployCodeStore
+
+
+class Fetcher:
+    def __init__(self, codes: dict):
+        self.codes = codes
+        self.calls = []
+
+    def __call__(self, job: str) -> str:
+        self.calls.append(job)
+        code = self.codes[job]
+        if isinstance(code, Exception):
+            raise code
+        return code
+
+
+def test_fetch_requests_each_job_once():
+    fetcher = Fetcher({'job_a': 'code a', 'job_b': ''})
+    store = DeployCodeStore(fetcher, max_workers=2)
+
+    assert store.fetch(['job_a', 'job_b', 'job_a']) == {'job_a': 'code a', 'job_b': ''}
+    assert store.get('job_a') == 'code a'
+    assert sorted(fetcher.calls) == ['job_a', 'job_b']
+
+
+def test_errors_are_not_cached():
+    fetcher = Fetcher({'job_a': LookupError('no deploy')})
+    store = DeployCodeStore(fetcher)
+
+    assert store.fetch(['job_a']) == {}
+    assert isinstance(store.errors['job_a'], LookupError)
+    with pytest.raises(LookupError):
+        store.get('job_a')
+
+    fetcher.codes['job_a'] = 'code a'
+    assert store.get('job_a') == 'code a'
+    assert store.errors == {}
+    assert fetcher.calls == ['job_a', 'job_a', 'job_a']
@@ -0,0 +1,41 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+
+@pytest.fixture(scope='module')
+def PackageModels(import_with_stubs):
+    return import_with_stubs('Framework.ETLobjects.PackageModels')
+
+
+class FakeSparkSQL:
+    instances = []
+    lock = threading.Lock()
+
+    def __init__(self):
+        self.closed = False
+        with self.lock:
+            self.instances.append(self)
+
+    def get_columns_full_info(self, table: str) -> dict:
+        assert not self.closed
+        return {table: ['id']}
+
+    def close(self):
+        self.closed = True
+
+
+def test_worker_spark_sql_clients_are_closed(PackageModels, monkeypatch):
+    FakeSparkSQL.instances = []
+    monkeypatch.setattr(PackageModels, 'SparkSQL', FakeSparkSQL)
+    monkeypatch.setattr(PackageModels.SASpackage, 'table_factory', SimpleNamespace(dlh_prefix='test'))
+    package = PackageModels.SASpackage.__new__(PackageModels.SASpackage)
+    items = [{'name': '<>_emart.table_{0}'.format(number), 'backup_id': ''} for number in range(10)]
+    package.get_vial_object_index = lambda plugin, task_stage: SimpleNamespace(items=items)
+
+    columns = package.get_all_columns_with_types_for_dlh()
+
+    assert sorted(columns) == ['test_emart.table_{0}'.format(number) for number in range(10)]
+    assert 0 < len(FakeSparkSQL.instances) <= PackageModels.DLH_COLUMNS_WORKERS
+    assert all(spark_sql.closed for spark_sql in FakeSparkSQL.instances)
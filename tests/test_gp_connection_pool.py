@@ -0,0 +1,222 @@
+import threading
+import time
+
+import pytest
+
+from Framework.utils import gp_connection_pool
+from Framework.utils.gp_connection_pool import GreenPlumConnectionPool, LazyGreenPlumConnection
+
+
+class FakeConnection:
+    def __init__(self, number: int):
+        self.number = number
+        self.alive = True
+        self.closed = False
+        self.session_settings = {}
+
+    def executeAndReturnLists(self, query: str):
+        if not self.alive:
+            raise ConnectionError('server closed the connection unexpectedly')
+        if query == 'reset all':
+            self.session_settings.clear()
+            return []
+        if query.startswith('set '):
+            name, value = query[4:].split(' = ')
+            self.session_settings[name] = value
+            return []
+        if query == 'fail':
+            raise ValueError('syntax error')
+        return [[self.number]]
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def connections():
+    return []
+
+
+@pytest.fixture
+def make_pool(connections):
+    def make_pool(max_size: int = 1, health_check_interval: float = 30.0) -> GreenPlumConnectionPool:
+        def factory():
+            connection = FakeConnection(len(connections))
+            connections.append(connection)
+            return connection
+        return GreenPlumConnectionPool(factory, max_size, health_check_interval)
+    return make_pool
+
+
+def test_pool_reuses_released_connection(make_pool, connections):
+    pool = make_pool()
+    first = pool.acquire(timeout=1)
+    pool.release(first)
+
+    assert pool.acquire(timeout=1) is first
+    assert len(connections) == 1
+
+
+def test_exhausted_pool_times_out(make_pool):
+    pool = make_pool(max_size=1)
+    pool.acquire(timeout=1)
+
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.1)
+    assert time.monotonic() - started < 1
+
+
+def test_exhausted_pool_waits_for_release(make_pool):
+    pool = make_pool(max_size=1)
+    connection = pool.acquire(timeout=1)
+    threading.Timer(0.05, pool.release, args=(connection,)).start()
+
+    assert pool.acquire(timeout=1) is connection
+
+
+def test_broken_connection_is_replaced(make_pool, connections):
+    pool = make_pool(max_size=1)
+    connection = pool.acquire(timeout=1)
+    pool.release(connection, broken=True)
+
+    assert connection.closed
+    assert pool.acquire(timeout=1) is not connection
+    assert pool.size == 1
+
+
+def test_idle_connection_failing_health_check_is_reopened(make_pool, connections):
+    pool = make_pool(max_size=1, health_check_interval=0)
+    connection = pool.acquire(timeout=1)
+    pool.release(connection)
+    connection.alive = False
+
+    assert pool.acquire(timeout=1) is connections[1]
+    assert connection.closed
+
+
+def test_lease_releases_dead_connection_as_broken(make_pool, connections):
+    pool = make_pool(max_size=1)
+    with pytest.raises(ConnectionError):
+        with pool.lease(timeout=1) as connection:
+            connection.alive = False
+            connection.executeAndReturnLists('select 1')
+
+    assert connection.closed
+    assert pool.acquire(timeout=1) is connections[1]
+
+
+def test_lease_keeps_connection_after_query_error(make_pool):
+    pool = make_pool(max_size=1)
+    with pytest.raises(ValueError):
+        with pool.lease(timeout=1) as connection:
+            connection.executeAndReturnLists('fail')
+
+    assert not connection.closed
+    assert pool.acquire(timeout=1) is connection
+
+
+def test_lazy_connection_keeps_one_session(make_pool, connections):
+    pool = make_pool(max_size=2)
+    gp = LazyGreenPlumConnection(pool, timeout=1)
+
+    # обращение к атрибуту сессию не открывает
+    execute = gp.executeAndReturnLists
+    assert not gp.connected and connections == []
+
+    execute('set search_path = test_emart')
+    assert gp.executeAndReturnLists('select 1') == [[0]]
+    assert connections[0].session_settings == {'search_path': 'test_emart'}
+    assert len(connections) == 1
+
+    gp.release()
+    assert not gp.connected
+    assert pool.acquire(timeout=1) is connections[0]
+
+
+def test_lazy_connection_reopens_broken_session(make_pool, connections):
+    pool = make_pool(max_size=1)
+    gp = LazyGreenPlumConnection(pool, timeout=1)
+    gp.executeAndReturnLists('select 1')
+    connections[0].alive = False
+
+    with pytest.raises(ConnectionError):
+        gp.executeAndReturnLists('select 1')
+
+    assert connections[0].closed
+    assert gp.executeAndReturnLists('select 1') == [[1]]
+
+
+def test_two_lazy_connections_share_pool_of_one(make_pool, connections):
+    pool = make_pool(max_size=1)
+    first = LazyGreenPlumConnection(pool, timeout=0.1)
+    second = LazyGreenPlumConnection(pool, timeout=0.1)
+
+    # у каждого пакета своя сессия, второй не ждет, пока первый отдаст свою
+    assert first.executeAndReturnLists('select 1') == [[0]]
+    assert second.executeAndReturnLists('select 1') == [[1]]
+    # место для обычных подключений пула сессии не занимают
+    with pool.lease(timeout=0.1) as connection:
+        assert connection is connections[2]
+
+    first.release()
+    second.release()
+    # после возврата сессий в пуле остается не больше max_size подключений
+    assert pool.size == 1
+    assert sum(connection.closed for connection in connections) == 2
+
+
+def test_lazy_connection_reports_failed_connect(make_pool):
+    def factory():
+        raise ConnectionError('could not connect to server')
+
+    gp = LazyGreenPlumConnection(GreenPlumConnectionPool(factory, 1), timeout=0.1)
+
+    assert not gp.connect()
+    with pytest.raises(ConnectionError):
+        gp.executeAndReturnLists('select 1')
+    assert gp.pool.size == 0
+
+
+def test_fixture_pools_are_separate_from_analyzer_pools(monkeypatch):
+    monkeypatch.setattr(gp_connection_pool, '_pools', {})
+    monkeypatch.setenv('PYTEST_XDIST_WORKER_COUNT', '8')
+
+    assert gp_connection_pool.get_worker_pool_size() == 1
+    assert gp_connection_pool.get_gp_fixtures_pool() is not gp_connection_pool.get_gp_pool()
+    assert gp_connection_pool.get_gp_prod_fixtures_pool() is not gp_connection_pool.get_gp_prod_pool()
+
+
+def test_reset_clears_session_before_release(make_pool, connections):
+    pool = make_pool(max_size=1)
+    connection = pool.acquire(timeout=1)
+    connection.executeAndReturnLists('set search_path = test_emart')
+
+    pool.release(connection, broken=not pool.reset(connection))
+
+    assert pool.acquire(timeout=1) is connection
+    assert connection.session_settings == {}
+
+
+def test_reset_of_dead_connection_releases_it_as_broken(make_pool, connections):
+    pool = make_pool(max_size=1)
+    connection = pool.acquire(timeout=1)
+    connection.alive = False
+
+    pool.release(connection, broken=not pool.reset(connection))
+
+    assert connection.closed
+    assert pool.acquire(timeout=1) is connections[1]
+
+
+def test_session_finish_closes_all_pools(import_with_stubs, make_pool, monkeypatch):
+    gp_fixtures = import_with_stubs('Framework.pytest_fixtures.GP.GP_fixtures')
+    pool = make_pool(max_size=1)
+    connection = pool.acquire(timeout=1)
+    pool.release(connection)
+    monkeypatch.setattr(gp_connection_pool, '_pools', {'gp_fixtures': pool})
+
+    gp_fixtures.pytest_sessionfinish(session=None, exitstatus=0)
+
+    assert connection.closed
+    assert pool.size == 0
@@ -0,0 +1,40 @@
+import threading
+
+import pytest
+
+
+@pytest.fixture(scope='module')
+def dag(import_with_stubs):
+    return import_with_stubs('Framework.ETLobjects.dag')
+
+
+def test_dags_are_created_in_parallel_with_explicit_settings(dag, monkeypatch):
+    monkeypatch.setattr(dag.TediDag, 'contour_default', 'ChimeraContour')
+    monkeypatch.setattr(dag.TediDag, 'custom_tedi_api_conf', {'host': 'chimera'})
+    # оба конструктора должны одновременно оказаться внутри dag_loader
+    barrier = threading.Barrier(2, timeout=5)
+    settings = {}
+
+    def dag_loader(dag_name, contour=None, custom_config_for_tedi_api=None):
+        settings[dag_name] = (contour, custom_config_for_tedi_api)
+        barrier.wait()
+        # настройки, измененные во время загрузки, на уже начатую загрузку не влияют
+        dag.TediDag.contour_default = 'TestVialContour'
+        return dag_name.upper()
+
+    loaded = dag.load_tedi_dags(['a', 'b'], dag_loader, action=lambda tedi_dag: tedi_dag + '!', max_workers=2)
+
+    assert {name: result.value for name, result in loaded.items()} == {'a': 'A!', 'b': 'B!'}
+    assert settings == {'a': ('ChimeraContour', {'host': 'chimera'}), 'b': ('ChimeraContour', {'host': 'chimera'})}
+
+
+def test_dag_load_error_is_kept_in_result(dag):
+    def dag_loader(dag_name, **settings):
+        if dag_name == 'broken':
+            raise ValueError(dag_name)
+        return dag_name
+
+    loaded = dag.load_tedi_dags(['ok', 'broken'], dag_loader)
+
+    assert loaded['ok'].dag == 'ok' and loaded['ok'].error is None
+    assert loaded['broken'].dag is None and isinstance(loaded['broken'].error, ValueError)
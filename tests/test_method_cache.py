@@ -0,0 +1,118 @@
+import pickle
+
+from helpers.method_cache import cached_method, invalidate_cached, clear_cached, cache_info
+
+
+def columns_key(table, table_type='GpTable', *args, **kwargs):
+    return table, table_type
+
+
+class Analyzer:
+    def __init__(self):
+        self.calls = []
+
+    @cached_method()
+    def get_columns(self, table, table_type='GpTable'):
+        self.calls.append((table, table_type))
+        return [table, table_type]
+
+    @cached_method(key=columns_key)
+    def get_changed_columns(self, table, table_type='GpTable', contour_prefix=None):
+        self.calls.append((table, table_type, contour_prefix))
+        return None
+
+    @cached_method(maxsize=2)
+    def get_ddl(self, table):
+        self.calls.append(table)
+        return table.upper()
+
+    @cached_method()
+    def fail(self, table):
+        self.calls.append(table)
+        raise ValueError(table)
+
+
+def test_results_are_cached_per_arguments():
+    analyzer = Analyzer()
+
+    assert analyzer.get_columns('a') == ['a', 'GpTable']
+    assert analyzer.get_columns('a') is analyzer.get_columns('a')
+    analyzer.get_columns('a', 'DlhTable')
+
+    assert analyzer.calls == [('a', 'GpTable'), ('a', 'DlhTable')]
+    assert cache_info(analyzer, 'get_columns') == (2, 2, None, 2)
+
+
+def test_keyword_arguments_form_a_separate_key():
+    analyzer = Analyzer()
+    analyzer.get_columns('a', 'GpTable')
+    analyzer.get_columns('a', table_type='GpTable')
+
+    assert len(analyzer.calls) == 2
+
+
+def test_key_function_and_none_result():
+    analyzer = Analyzer()
+
+    assert analyzer.get_changed_columns('a', 'GpTable', 'vld1') is None
+    assert analyzer.get_changed_columns('a', 'GpTable', 'vld2') is None
+
+    # префикс в ключ не входит, None - тоже закэшированный результат
+    assert analyzer.calls == [('a', 'GpTable', 'vld1')]
+
+
+def test_invalidate_and_clear():
+    analyzer = Analyzer()
+    analyzer.get_changed_columns('a')
+    analyzer.get_changed_columns('b')
+
+    assert invalidate_cached(analyzer, 'get_changed_columns', ('a', 'GpTable'))
+    assert not invalidate_cached(analyzer, 'get_changed_columns', ('a', 'GpTable'))
+    assert not invalidate_cached(analyzer, 'get_columns', ('a',))
+    analyzer.get_changed_columns('a')
+    analyzer.get_changed_columns('b')
+    assert analyzer.calls == [('a', 'GpTable', None), ('b', 'GpTable', None), ('a', 'GpTable', None)]
+
+    clear_cached(analyzer)
+    analyzer.get_changed_columns('b')
+    assert len(analyzer.calls) == 4
+
+
+def test_caches_are_per_instance():
+    first, second = Analyzer(), Analyzer()
+    first.get_columns('a')
+    second.get_columns('a')
+
+    assert len(first.calls) == len(second.calls) == 1
+
+
+def test_lru_eviction():
+    analyzer = Analyzer()
+    for table in ('a', 'b', 'a', 'c', 'a', 'b'):
+        analyzer.get_ddl(table)
+
+    # 'b' вытеснен при добавлении 'c', 'a' оставался самым свежим
+    assert analyzer.calls == ['a', 'b', 'c', 'b']
+    assert cache_info(analyzer, 'get_ddl').currsize == 2
+
+
+def test_exceptions_are_not_cached():
+    analyzer = Analyzer()
+    for _ in range(2):
+        try:
+            analyzer.fail('a')
+        except ValueError:
+            pass
+
+    assert analyzer.calls == ['a', 'a']
+
+
+def test_cache_survives_pickling():
+    analyzer = Analyzer()
+    analyzer.get_columns('a')
+
+    restored = pickle.loads(pickle.dumps(analyzer))
+    restored.get_columns('a')
+
+    assert restored.calls == [('a', 'GpTable')]
+    assert cache_info(restored, 'get_columns').hits == 1
@@ -0,0 +1,67 @@
+import pytest
+
+
+@pytest.fixture(scope='module')
+def PackageModels(import_with_stubs):
+    return import_with_stubs('Framework.ETLobjects.PackageModels')
+
+
+def relation(entity_name, entity_type, destination_name, destination_type):
+    return {'entity_name': entity_name, 'entity_type': entity_type, 'urn': 'urn:' + entity_name,
+            'source_rel_type': 'READ', 'source_name': None, 'source_urn': None, 'source_type': None,
+            'source_attribute': None, 'dest_rel_type': 'WRITE', 'destination_name': destination_name,
+            'destination_urn': 'urn:' + destination_name, 'destination_type': destination_type,
+            'dest_attribute': None}
+
+
+class FakeMgHelper:
+    RELATIONS = [
+        relation('JOB_A', 'JOB', 'prod_emart.client', 'TABLE'),
+        # приемник джоба, который не таблица, таргетом не считается
+        relation('JOB_A', 'JOB', 'emart_daily', 'DAG'),
+        relation('JOB_B', 'JOB', 'prod_emart.client', 'TABLE'),
+        # одноименный джобу объект другого типа
+        relation('JOB_B', 'DAG', 'prod_emart.deal', 'TABLE'),
+        relation('prod_emart.client', 'TABLE', 'JOB_C', 'JOB'),
+        relation('prod_emart.client', 'TABLE', 'prod_emart.client_view', 'TABLE'),
+    ]
+
+    def __init__(self):
+        self.calls = []
+
+    def get_all_relations_objects_by_names(self, names):
+        self.calls.append(('relations', frozenset(names)))
+        return [raw for raw in self.RELATIONS if raw['entity_name'] in names]
+
+    def get_target_phys_by_job_name(self, job):
+        self.calls.append(('targets', job))
+        return [('prod_emart.rate', 'TABLE')]
+
+    def get_urn_of_object(self, name):
+        self.calls.append(('urn', name))
+        return [('urn:' + name,)]
+
+    def get_depend_etl_objects_by_urn(self, urn):
+        self.calls.append(('depend', urn))
+        return [('JOB_D', 'JOB')]
+
+
+def test_jobs_and_targets_are_resolved_in_batches(PackageModels):
+    package = PackageModels.SASpackage.__new__(PackageModels.SASpackage)
+    mg_helper = FakeMgHelper()
+
+    targets_by_job, depend_objects_by_target = package._get_jobs_targets_and_depend_objects(
+        mg_helper, ['JOB_A', 'JOB_B', 'JOB_A', 'JOB_NEW'])
+
+    assert targets_by_job == {'JOB_A': {'prod_emart.client'}, 'JOB_B': {'prod_emart.client'},
+                              'JOB_NEW': {'prod_emart.rate'}}
+    assert depend_objects_by_target == {'prod_emart.client': [('JOB_C', 'JOB')],
+                                        'prod_emart.rate': [('JOB_D', 'JOB')]}
+    # два пакетных запроса, по одному остаются только джоб и таргет, которых нет в реплике
+    assert mg_helper.calls == [
+        ('relations', frozenset({'JOB_A', 'JOB_B', 'JOB_NEW'})),
+        ('targets', 'JOB_NEW'),
+        ('relations', frozenset({'prod_emart.client', 'prod_emart.rate'})),
+        ('urn', 'prod_emart.rate'),
+        ('depend', 'urn:prod_emart.rate'),
+    ]
@@ -0,0 +1,89 @@
+import os
+import pickle
+
+import pytest
+
+from Framework.ETLobjects.package_catalog import PackageFileCatalog, PackageParseManifest
+
+
+@pytest.fixture
+def package_dir(tmp_path):
+    for path in ('config.hat', 'release/spk/job-a.spk', 'release/cut2/settings.json', 'backup/old.sql',
+                 'scripts/load.SQL', '.svn/entries'):
+        full_path = tmp_path / path
+        full_path.parent.mkdir(parents=True, exist_ok=True)
+        full_path.write_text('')
+    return tmp_path
+
+
+def test_catalog_skips_svn_and_indexes_files(package_dir):
+    catalog = PackageFileCatalog.scan(str(package_dir))
+
+    assert sorted(f.name for f in catalog.Files) == ['config.hat', 'job-a.spk', 'load.SQL', 'old.sql',
+                                                     'settings.json']
+    assert sorted(f.name for f in catalog.getFiles('sql')) == ['load.SQL', 'old.sql']
+    assert [f.name for f in catalog.getFiles('sql', exclude_top_directories=('backup',))] == ['load.SQL']
+    assert [f.name for f in catalog.getFiles(under='release/cut2')] == ['settings.json']
+    assert [f.top_directory for f in catalog.getFiles('hat')] == ['']
+
+
+def test_manifest_round_trip(tmp_path):
+    config = tmp_path / 'config.hat'
+    config.write_text('meta')
+    other = tmp_path / 'job.spk'
+    other.write_text('')
+    manifest_path = str(tmp_path / 'manifest.pkl')
+    meta_objects = [('EMART LOAD', '/Jobs', 'Jobs/EMART LOAD', 'n', 'Job')]
+
+    manifest = PackageParseManifest(manifest_path)
+    fingerprint = manifest.fingerprint(str(config))
+    manifest.setFileObject(str(config), 'config object')
+    manifest.setFileObject(str(other), 'job object')
+    manifest.setMetaObjects(str(config), fingerprint, meta_objects)
+    manifest.setFiles([str(config)])
+    manifest.save()
+
+    # временный файл не остается рядом с манифестом
+    assert sorted(os.listdir(tmp_path)) == ['config.hat', 'job.spk', 'manifest.pkl']
+
+    loaded = PackageParseManifest(manifest_path)
+    assert loaded.load()
+    assert loaded.getMetaObjects(str(config), fingerprint) == meta_objects
+    assert loaded.getFileObject(str(config)) == 'config object'
+    # пропавший из пакета файл не хранится
+    assert loaded.getFileObject(str(other)) is None
+
+
+def test_manifest_detects_content_change_with_same_size_and_mtime(tmp_path):
+    config = tmp_path / 'config.hat'
+    config.write_text('meta')
+    stat = os.stat(config)
+    manifest = PackageParseManifest(str(tmp_path / 'manifest.pkl'))
+    manifest.setMetaObjects(str(config), manifest.fingerprint(str(config)), ['meta object'])
+
+    config.write_text('mute')
+    os.utime(config, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    assert manifest.getMetaObjects(str(config), manifest.fingerprint(str(config))) is None
+
+
+@pytest.mark.parametrize('content', [b'', b'not a pickle', b'\x80\x05K', pickle.dumps({'version': -1}),
+                                     pickle.dumps(['configs'])])
+def test_manifest_load_falls_back_on_bad_file(tmp_path, content):
+    manifest_path = tmp_path / 'manifest.pkl'
+    manifest_path.write_bytes(content)
+
+    manifest = PackageParseManifest(str(manifest_path))
+    assert not manifest.load()
+    assert manifest.getFileObject('a') is None
+
+
+def test_catalog_survives_pickling(package_dir):
+    catalog = PackageFileCatalog.scan(str(package_dir))
+
+    restored = pickle.loads(pickle.dumps(catalog))
+
+    assert restored.RootPath == catalog.RootPath
+    assert restored.Files == catalog.Files
+    assert sorted(f.name for f in restored.getFiles('sql')) == ['load.SQL', 'old.sql']
+    assert [f.name for f in restored.getFiles(under='release/cut2')] == ['settings.json']
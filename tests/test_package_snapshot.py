@@ -0,0 +1,79 @@
+import pickle
+from types import SimpleNamespace
+
+import pytest
+
+
+@pytest.fixture(scope='module')
+def PackageModels(import_with_stubs):
+    return import_with_stubs('Framework.ETLobjects.PackageModels')
+
+
+@pytest.fixture
+def package(PackageModels, tmp_path):
+    package_path = tmp_path / 'TASK-1'
+    (package_path / 'release' / 'spk').mkdir(parents=True)
+    (package_path / 'release' / 'spk' / 'load.spk').write_text('')
+    (package_path / 'config.hat').write_text('/Jobs/EMART LOAD(Job){n}\n/Dags/emart_load(Dag){s}\n')
+    work_path = tmp_path / 'work'
+    work_path.mkdir()
+
+    package = PackageModels.SASpackage.__new__(PackageModels.SASpackage)
+    package.name = 'TASK-1'
+    package.path = str(package_path)
+    package._file_catalog = None
+    package._reset_connections()
+    # разбор настоящим Package с каталогом файлов, как в init_package_object
+    package._pack = PackageModels.Package(package.name, package.path, str(work_path),
+                                          file_catalog=package.file_catalog)
+    package._pack.parsePackage()
+    return package
+
+
+def test_snapshot_round_trip_keeps_parsed_package(PackageModels, package, tmp_path, monkeypatch):
+    # открытое подключение в снимок не попадает
+    package.GPConnection = object()
+    snapshot_path = str(tmp_path / 'TASK-1.snapshot')
+    package.dump_snapshot(snapshot_path)
+
+    loaded = PackageModels.SASpackage.load_snapshot(snapshot_path)
+
+    assert loaded.name == 'TASK-1'
+    assert sorted(meta.Name for meta in loaded.getMetaObjects('Meta{}')) == ['EMART LOAD', 'emart_load']
+    assert [meta.Name for meta in loaded.getMetaObjects('Dag{s}')] == ['emart_load']
+    assert [f.name for f in loaded.file_catalog.getFiles('spk')] == ['load.spk']
+    assert loaded.__dict__['_gp_connection'] is None
+    assert loaded.__dict__['_gp_prod_connection'] is None
+
+    pool = object()
+    monkeypatch.setattr(PackageModels, 'get_gp_pool', lambda: pool)
+    assert loaded.GPConnection.pool is pool
+
+
+def test_snapshot_of_other_version_is_rejected(PackageModels, tmp_path):
+    snapshot_path = tmp_path / 'TASK-1.snapshot'
+    with open(snapshot_path, 'wb') as f_out:
+        pickle.dump({'format': PackageModels.SNAPSHOT_FORMAT_NAME, 'version': -1, 'class': 'SASpackage'}, f_out)
+        pickle.dump({}, f_out)
+
+    with pytest.raises(PackageModels.PackageSnapshotError):
+        PackageModels.SASpackage.load_snapshot(str(snapshot_path))
+
+
+def test_failed_snapshot_falls_back_to_worker_parse(import_with_stubs, PackageModels, package, tmp_path,
+                                                    monkeypatch):
+    base_fixtures = import_with_stubs('Framework.pytest_fixtures.BASE.base_fixtures')
+
+    def dump_snapshot(snapshot_path):
+        raise TypeError('cannot pickle')
+
+    monkeypatch.setattr(package, 'dump_snapshot', dump_snapshot)
+    config = SimpleNamespace(option=SimpleNamespace(pack=package, temp_path=str(tmp_path), task='TASK-1'))
+    nodes = [SimpleNamespace(config=config, workerinput={}) for _ in range(2)]
+
+    for node in nodes:
+        base_fixtures.pytest_configure_node(node)
+
+    # снимок не передается, воркеры берут пакет, разобранный ими самими
+    assert [node.workerinput for node in nodes] == [{}, {}]
+    assert not list(tmp_path.glob('*.snapshot*'))
@@ -0,0 +1,31 @@
+from Framework.ETLobjects.vial_objects import VialObjectIndex
+
+VIAL_OBJECTS = {'items': [
+    {'name': '<>_emart.client', 'backup_id': 'bckp_emart.client_1', 'extra_params': []},
+    {'name': 'emart.deal', 'backup_id': None, 'extra_params': [{'value': 'vld1_emart.deal'}]},
+    {'name': '<>_emart.client', 'backup_id': 'bckp_emart.client_2', 'extra_params': None},
+    {'name': 'emart.rate', 'backup_id': 'bckp_emart.rate', 'extra_params': [{'value': 'vld1_emart.deal'}]},
+]}
+
+
+def test_find_first_keeps_response_order():
+    index = VialObjectIndex(VIAL_OBJECTS)
+
+    assert index.find_first('emart.client', '<>_emart.client')['backup_id'] == 'bckp_emart.client_1'
+    assert index.find_first('emart.rate', 'emart.deal')['name'] == 'emart.deal'
+    assert index.find_first('emart.unknown') is None
+
+
+def test_find_last_by_name_or_phys_name():
+    index = VialObjectIndex(VIAL_OBJECTS)
+
+    assert index.find_last('<>_emart.client')['backup_id'] == 'bckp_emart.client_2'
+    assert index.find_last('emart.deal', 'vld1_emart.deal')['name'] == 'emart.rate'
+    assert index.find_last('emart.unknown', 'vld1_emart.unknown') is None
+
+
+def test_empty_response():
+    index = VialObjectIndex({'items': None})
+
+    assert index.items == ()
+    assert index.find_first('emart.deal') is None